@@ -1,5 +1,6 @@
 
 import json
+import functools
 from scalecodec.utils.ss58 import ss58_encode, ss58_decode, get_ss58_format
 from scalecodec.base import ScaleBytes
 from typing import Union, Optional
@@ -27,6 +28,27 @@ import commune as c
 
 __all__ = ['Keypair', 'KeypairType', 'MnemonicLanguageCode']
 
+BASE58_ALPHABET = frozenset('123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz')
+
+@functools.lru_cache(maxsize=4096)
+def is_valid_ss58_address(address: str, ss58_format: int = 42) -> bool:
+    # the alphabet check is a C level set scan, reject before the base58 decode + blake2b checksum
+    if len(address) == 0 or not BASE58_ALPHABET.issuperset(address):
+        return False
+    try:
+        return ss58.is_valid_ss58_address( address, valid_ss58_format=ss58_format )
+    except (IndexError):
+        return False
+
+# the same few keys are encoded/decoded on every signature, keep the results
+@functools.lru_cache(maxsize=4096)
+def cached_ss58_encode(public_key: Union[bytes, str], ss58_format: int = 42) -> str:
+    return ss58_encode(public_key, ss58_format=ss58_format)
+
+@functools.lru_cache(maxsize=4096)
+def cached_ss58_decode(address: str, valid_ss58_format: Optional[int] = None) -> str:
+    return ss58_decode(address, valid_ss58_format=valid_ss58_format)
+
 
 class KeypairType:
     """
@@ -122,7 +144,7 @@ class Keypair(c.Module):
 
 
         if crypto_type != KeypairType.ECDSA and ss58_address and not public_key:
-            public_key = ss58_decode(ss58_address, valid_ss58_format=ss58_format)
+            public_key = cached_ss58_decode(ss58_address, valid_ss58_format=ss58_format)
 
         if private_key:
 
@@ -154,7 +176,7 @@ class Keypair(c.Module):
                 raise ValueError('Public key should be 32 bytes long')
 
             if not ss58_address:
-                ss58_address = ss58_encode(public_key, ss58_format=ss58_format)
+                ss58_address = cached_ss58_encode(public_key, ss58_format=ss58_format)
 
         self.public_key: bytes = public_key
 
@@ -692,7 +714,7 @@ class Keypair(c.Module):
         else:
             raise ValueError('crypto_type "{}" not supported'.format(crypto_type))
 
-        ss58_address = ss58_encode(public_key, ss58_format)
+        ss58_address = cached_ss58_encode(public_key, ss58_format)
 
 
         kwargs =  dict(
@@ -991,7 +1013,7 @@ class Keypair(c.Module):
         if isinstance(data, dict):
 
             signature = data.pop('signature')
-            public_key = c.ss58_decode(data.pop('address'))
+            public_key = cached_ss58_decode(data.pop('address'))
             if 'data' in data:
                 data = data.pop('data')
             
@@ -1035,7 +1057,7 @@ class Keypair(c.Module):
             verified = crypto_verify_fn(signature, b'<Bytes>' + data + b'</Bytes>', public_key)
 
         if return_address:
-            return ss58_encode(public_key, ss58_format=ss58_format)
+            return cached_ss58_encode(public_key, ss58_format=ss58_format)
         return verified
 
 
@@ -1434,10 +1456,9 @@ class Keypair(c.Module):
         Returns:
             True if the address is a valid ss58 address for Bittensor, False otherwise.
         """
-        try:
-            return ss58.is_valid_ss58_address( address, valid_ss58_format=c.__ss58_format__ )
-        except (IndexError):
+        if not isinstance(address, str):
             return False
+        return is_valid_ss58_address( address, ss58_format=c.__ss58_format__ )
         
     @classmethod
     def is_valid_ed25519_pubkey(cls, public_key: Union[str, bytes] ) -> bool:
@@ -1,5 +1,4 @@
 
-from retry import retry
 from typing import *
 import json
 import os
@@ -89,14 +88,19 @@ class Network(c.Module):
         : dict of options to pass to the websocket-client create_connection function
                 
         '''
+        # without an explicit url, reuse the open connection of the network instead of dialing a new node per call
+        pool_key = url or f'{network}::{mode}'
         if cache:
-            if url in self.url2substrate:
-                return self.url2substrate[url]
-
+            if pool_key in self.url2substrate:
+                substrate = self.url2substrate[pool_key]
+                self.network = network
+                self.url = substrate.url
+                return substrate
 
+        requested_url = url
         while trials > 0:
             try:
-                url = self.resolve_url(url, mode=mode, network=network)
+                url = self.resolve_url(requested_url, mode=mode, network=network)
 
                 substrate= SubstrateInterface(url=url, 
                             websocket=websocket, 
@@ -111,11 +115,11 @@ class Network(c.Module):
                 break
             except Exception as e:
                 trials = trials - 1
-                if trials > 0:
+                if trials == 0:
                     raise e
         
         if cache:
-            self.url2substrate[url] = substrate
+            self.url2substrate[pool_key] = substrate
 
         self.network = network
         self.url = url
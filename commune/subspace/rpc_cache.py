@@ -0,0 +1,174 @@
+import copy
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from collections import OrderedDict
+
+
+class BlockCache:
+    """
+    Bounded in-process LRU for chain reads that are pinned to a block.
+    The state at a given block never changes, so entries are only evicted, never expired.
+    Values go in and come out as deep copies, so a caller editing its result cant change the cache.
+    """
+
+    def __init__(self, maxsize:int = 4096):
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.cache:
+                return default
+            self.cache.move_to_end(key)
+            value = self.cache[key]
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        cached_value = copy.deepcopy(value)
+        with self.lock:
+            self.cache[key] = cached_value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        return value
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return key in self.cache
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+class InFlight:
+    """
+    Coalesces identical requests that run at the same time. The first caller does the 
+    request and the others wait on its future, so N concurrent duplicates cost one rpc.
+    """
+
+    def __init__(self):
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def run(self, key, fn, *args, **kwargs):
+        with self.lock:
+            future = self.futures.get(key)
+            is_owner = future == None
+            if is_owner:
+                future = self.futures[key] = Future()
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise e
+        finally:
+            with self.lock:
+                self.futures.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self.futures)
+
+
+class Batcher:
+    """
+    Folds single-item calls into fn(items) calls, fn returns one result per item. Every batch runs 
+    on one long-lived worker thread (so its pooled connection is reused), a lone call goes straight 
+    through and the calls that arrive while a batch is out go together in the next one (up to max_batch).
+    """
+
+    def __init__(self, fn, max_batch:int = 64):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def run(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        with self.lock:
+            if self.worker == None:
+                self.worker = threading.Thread(target=self.loop, daemon=True)
+                self.worker.start()
+        return future.result()
+
+    def loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.flush(batch)
+
+    def flush(self, batch:list):
+        try:
+            results = list(self.fn([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise ValueError(f'Expected {len(batch)} results, got {len(results)}')
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            # every caller is waiting on its future, none can be left without an answer
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def __len__(self) -> int:
+        return self.queue.qsize()
+
+
+class TTLCache:
+    """
+    Bounded LRU whose entries expire ttl seconds after they are put (ttl=None never expires), 
+    for reads of the head that are only good for about a block.
+    """
+
+    def __init__(self, maxsize:int = 256, ttl:float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.cache:
+                return default
+            value, expiry = self.cache[key]
+            if expiry != None and time.time() > expiry:
+                del self.cache[key]
+                return default
+            self.cache.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl:float = None):
+        ttl = self.ttl if ttl == None else ttl
+        with self.lock:
+            self.cache[key] = (value, None if ttl == None else time.time() + ttl)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, None) != None
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
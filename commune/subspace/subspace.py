@@ -1,15 +1,57 @@
 
-from retry import retry
 from typing import *
 import json
 import os
+import pickle
+import threading
 import commune as c
-import requests 
 from substrateinterface import SubstrateInterface
+from substrateinterface.exceptions import SubstrateRequestException
+from commune.subspace.rpc_cache import BlockCache, InFlight, Batcher, TTLCache
 
 U32_MAX = 2**32 - 1
 U16_MAX = 2**16 - 1
 
+
+class SubmittedError(Exception):
+    """
+    An extrinsic went out but waiting on it failed (watch timed out, socket dropped), 
+    it may still land, so sending it again could run it twice.
+    """
+
+
+class MetadataCache:
+    """
+    Disk backed stand in for a dogpile cache region. SubstrateInterface stores the decoded
+    runtime metadata in it per spec version, so new connections skip state_getMetadata
+    until the runtime is upgraded.
+    """
+    def __init__(self, path:str):
+        self.path = path
+
+    def get(self, key:str):
+        path = os.path.join(self.path, f'{key}.pkl')
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            c.print(f'Failed to load cached metadata {path} ({e})', color='red')
+            return None
+
+    def set(self, key:str, value):
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, f'{key}.pkl')
+        try:
+            with open(path, 'wb') as f:
+                pickle.dump(value, f)
+        except Exception as e:
+            c.print(f'Failed to cache metadata {path} ({e})', color='red')
+            if os.path.exists(path):
+                os.remove(path)
+
+
 class Subspace(c.Module):
     """
     Handles interactions with the subspace chain.
@@ -79,6 +121,10 @@ class Subspace(c.Module):
                             'stake_from', 
                             'delegation_fee']
     cost = 1
+    # reads pinned to a block, shared by every instance (the disk store sits behind it)
+    block_cache = BlockCache(maxsize=4096)
+    # identical reads running at the same time share one rpc
+    in_flight = InFlight()
     block_time = 8 # (seconds)
     default_config = c.get_config('subspace', to_munch=False)
     token_decimals = 9
@@ -123,7 +169,26 @@ class Subspace(c.Module):
         
         return url
     
-    url2substrate = {}
+    # one connection per (network, mode) or url, per thread (substrate-interface is not thread safe)
+    substrate_pool = threading.local()
+
+    @classmethod
+    def get_substrate_pool(cls) -> dict:
+        if not hasattr(cls.substrate_pool, 'url2substrate'):
+            cls.substrate_pool.url2substrate = {}
+        return cls.substrate_pool.url2substrate
+
+    @classmethod
+    def reset_pool(cls):
+        url2substrate = cls.get_substrate_pool()
+        for substrate in url2substrate.values():
+            try:
+                substrate.close()
+            except Exception as e:
+                c.print(f'Failed to close {substrate.url} ({e})', color='red')
+        url2substrate.clear()
+        return {'success': True, 'msg': 'Reset the substrate pool'}
+
     def get_substrate(self, 
                 network:str = 'main',
                 url : str = None,
@@ -138,6 +203,7 @@ class Subspace(c.Module):
                 auto_reconnect=True, 
                 trials:int = 10,
                 cache:bool = True,
+                cache_metadata:bool = True,
                 mode = 'http',):
 
         
@@ -168,14 +234,23 @@ class Subspace(c.Module):
 
         network = network or self.config.network
 
-        if cache:
-            if url in self.url2substrate:
-                return self.url2substrate[url]
+        # without an explicit url, any node of the network will do
+        pool_key = url or f'{network}::{mode}'
+        url2substrate = self.get_substrate_pool()
+        if cache and pool_key in url2substrate:
+            substrate = url2substrate[pool_key]
+            self.network = network
+            self.url = substrate.url
+            return substrate
 
+        # persist the decoded metadata per network so new connections skip state_getMetadata
+        if cache_region == None and cache_metadata:
+            cache_region = MetadataCache(self.resolve_path(f'metadata/{network}'))
 
+        requested_url = url
         while trials > 0:
             try:
-                url = self.resolve_url(url, mode=mode, network=network)
+                url = self.resolve_url(requested_url, mode=mode, network=network)
 
                 substrate= SubstrateInterface(url=url, 
                             websocket=websocket, 
@@ -190,11 +265,11 @@ class Subspace(c.Module):
                 break
             except Exception as e:
                 trials = trials - 1
-                if trials > 0:
+                if trials == 0:
                     raise e
         
         if cache:
-            self.url2substrate[url] = substrate
+            url2substrate[pool_key] = substrate
 
         self.network = network
         self.url = url
@@ -202,6 +277,20 @@ class Subspace(c.Module):
         return substrate
 
 
+    def ensure_alive(self, substrate:SubstrateInterface) -> SubstrateInterface:
+        """
+        Pings the pooled websocket and reconnects it in place if the node dropped it,
+        so extrinsics reuse the connection instead of opening a new one per call.
+        """
+        if substrate.websocket == None:
+            return substrate
+        try:
+            substrate.websocket.ping()
+        except Exception as e:
+            c.print(f'Reconnecting to {substrate.url} ({e})', color='yellow')
+            substrate.connect_websocket()
+        return substrate
+
     def set_network(self, 
                 network:str = 'main',
                 mode = 'http',
@@ -379,14 +468,15 @@ class Subspace(c.Module):
               max_age=1000,
               trials = 4,
               mode = 'ws',
+              strict = False,
             update=False):
         
         """
         query a subspace storage function with params and block.
+        strict returns None instead of the type default when nothing is stored under the key.
         """
 
         network = self.resolve_network(network)
-        path = f'query/{network}/{module}.{name}'
     
         params = params or []
         if not isinstance(params, list):
@@ -394,38 +484,112 @@ class Subspace(c.Module):
         if netuid != None and netuid != 'all':
             params = [netuid] + params
             
-        # we want to cache based on the params if there are any
-        if len(params) > 0 :
-            path = path + f'::params::' + '-'.join([str(p) for p in params])
-
-        value = self.get(path, None, max_age=max_age, update=update)
+        path = self.resolve_query_path(name=name, params=params, module=module, network=network, block=block)
+
+        if block != None:
+            # the state at a fixed block never changes, so it can be kept for good
+            value = self.block_cache.get(path)
+            if value == None:
+                value = self.get(path, None, update=update)
+                if value != None:
+                    self.block_cache.put(path, value)
+        else:
+            value = self.get(path, None, max_age=max_age, update=update)
         if value != None:
             return value
         
-        while trials > 0:
-            try:
-                substrate = self.get_substrate(network=network, mode=mode)
-                response =  substrate.query(
-                    module=module,
-                    storage_function = name,
-                    block_hash = None if block == None else substrate.get_block_hash(block), 
-                    params = params
-                )
-                value =  response.value
-                break
-            except Exception as e:
-                trials = trials - 1
-                if trials == 0:
-                    raise e
-        
+        def query_chain(substrate):
+            response =  substrate.query(
+                module=module,
+                storage_function = name,
+                block_hash = None if block == None else self.block_hash(block, network=network), 
+                params = params
+            )
+            if strict and not response.meta_info['result_found']:
+                return None
+            return response.value
 
+        value = self.in_flight.run(('query', path, strict), self.read_rpc, query_chain, network=network, mode=mode, trials=trials)
+        if strict and value == None:
+            # nothing stored, dont cache the miss
+            return value
 
         # if the value is a tuple then we want to convert it to a list
         if save:
             self.put(path, value)
+        if block != None:
+            self.block_cache.put(path, value)
 
         return value
 
+    def read_rpc(self, fn:Callable, network:str = None, mode:str = 'ws', trials:int = 2):
+        """
+        Runs fn(substrate) for a state read. Reads are idempotent, so a dropped connection is reconnected
+        and retried right away, any other error (bad params, unknown storage) is raised on the first try.
+        """
+        from websocket import WebSocketException
+        for trial in range(trials):
+            substrate = self.get_substrate(network=network, mode=mode)
+            try:
+                return fn(substrate)
+            except (WebSocketException, OSError) as e:
+                if trial == trials - 1:
+                    raise e
+                c.print(f'Reconnecting to {substrate.url} ({e})', color='yellow')
+                if substrate.websocket != None:
+                    substrate.connect_websocket()
+
+    def resolve_query_path(self, name:str, params:list = None, module:str = 'SubspaceModule', network:str = network, block:int = None) -> str:
+        path = f'query/{network}/{module}.{name}'
+        # we want to cache based on the params if there are any
+        if params != None and len(params) > 0 :
+            path = path + f'::params::' + '-'.join([str(p) for p in params])
+        if block != None:
+            path = path + f'::block::{block}'
+        return path
+
+    def prefetch(self, queries:List[tuple], network:str = None, block:int = None) -> dict:
+        """
+        Fetches a batch of storage items in a single state_queryStorageAt request and 
+        stores them where query() looks them up, so the following queries dont hit the chain.
+        queries: [(module, name, params), ...]
+        """
+        network = self.resolve_network(network)
+        substrate = self.get_substrate(network=network)
+        block_hash = None if block == None else self.block_hash(block, network=network)
+        storage_keys = [self.storage_key(substrate, module, name, params) for module, name, params in queries]
+        results = substrate.query_multi(storage_keys, block_hash=block_hash)
+        path2value = {}
+        for (module, name, params), (storage_key, value) in zip(queries, results):
+            path = self.resolve_query_path(name=name, params=params, module=module, network=network, block=block)
+            path2value[path] = value.value
+            self.put(path, value.value)
+            if block != None:
+                self.block_cache.put(path, value.value)
+        return path2value
+
+    # (connection, runtime version, module, name, params) -> StorageKey
+    storage_key_cache = BlockCache(maxsize=8192)
+
+    def storage_key(self, substrate:SubstrateInterface, module:str, name:str, params:list = None) -> 'StorageKey':
+        """
+        substrate.create_storage_key re-initializes the runtime (3 rpcs) for every key it hashes.
+        The twox128/blake2 key of an item only changes with the runtime, so build it once per connection.
+        """
+        from substrateinterface.storage import StorageKey
+        if substrate.metadata == None:
+            substrate.init_runtime()
+        params = params or []
+        # keyed per connection, as the key decodes values with its connection's runtime config
+        cache_key = (id(substrate), substrate.runtime_version, module, name, str(params))
+        storage_key = self.storage_key_cache.get(cache_key)
+        if storage_key == None:
+            storage_key = StorageKey.create_from_storage_function(module, name, params, 
+                                                                  runtime_config=substrate.runtime_config, 
+                                                                  metadata=substrate.metadata)
+            self.storage_key_cache.put(cache_key, storage_key)
+        return storage_key
+
     def query_constant( self, 
                         constant_name: str, 
                        module_name: str = 'SubspaceModule', 
@@ -437,13 +601,21 @@ class Subspace(c.Module):
         """
 
         network = self.resolve_network(network)
-        substrate = self.get_substrate(network=network)
+        path = f'query/{network}/{module_name}.{constant_name}::block::{block}'
+        if block != None and path in self.block_cache:
+            return self.block_cache.get(path)
+
+        def query_chain(substrate):
+            return substrate.query(
+                module=module_name,
+                storage_function=constant_name,
+                block_hash = None if block == None else self.block_hash(block, network=network)
+            )
 
-        value =  substrate.query(
-            module=module_name,
-            storage_function=constant_name,
-            block_hash = None if block == None else substrate.get_block_hash(block)
-        )
+        value = self.in_flight.run(('query_constant', path), self.read_rpc, query_chain, network=network, mode='http')
+
+        if block != None:
+            self.block_cache.put(path, value)
             
         return value
     
@@ -484,13 +656,21 @@ class Subspace(c.Module):
         if len(params) > 0 :
             path = path + f'::params::' + '-'.join([str(p) for p in params])
         path = path+"::block::"
-        paths = self.glob(path + '*')
-        update = update or len(paths) == 0 or block != None
-        if not update:
-            last_path = sorted(paths, reverse=True)[0]
-            value = self.get(last_path, None , max_age=max_age)
+        if block != None:
+            # a map at a fixed block never changes, keep it in memory and on disk for good
+            value = None if update else self.block_cache.get(path + f'{block}')
+            if value == None and not update:
+                value = self.get(path + f'{block}', None)
+                if value != None:
+                    self.block_cache.put(path + f'{block}', value)
         else:
-            value = None
+            paths = self.glob(path + '*')
+            update = update or len(paths) == 0
+            if not update:
+                last_path = sorted(paths, reverse=True)[0]
+                value = self.get(last_path, None , max_age=max_age)
+            else:
+                value = None
 
         if value == None:
             # block = block or self.block
@@ -498,39 +678,38 @@ class Subspace(c.Module):
             network = self.resolve_network(network)
             # if the value is a tuple then we want to convert it to a list
     
-            while trials > 0:
-                try:
+            def query_map_chain(substrate):
+                # pull every page inside the retry, a connection dropped mid map restarts it
+                return list(substrate.query_map(
+                    module=module,
+                    storage_function = name,
+                    params = params,
+                    page_size = page_size,
+                    max_results = max_results,
+                    block_hash = substrate.get_block_hash(block) if block == None else self.block_hash(block, network=network)
+                ))
 
-                    substrate = self.get_substrate(network=network, mode=mode)
-                    qmap =  substrate.query_map(
-                        module=module,
-                        storage_function = name,
-                        params = params,
-                        page_size = page_size,
-                        max_results = max_results,
-                        block_hash =substrate.get_block_hash(block)
-                    )
-                    break
-                except Exception as e:
-                    trials = trials - 1
-                    if trials == 0:
-                        raise e
-                
+            qmap = self.read_rpc(query_map_chain, network=network, mode=mode, trials=trials)
 
             new_qmap = {} 
-            progress_bar = c.progress(qmap, desc=f'Querying {name} ma')
-            for (k,v) in qmap:
-                progress_bar.update(1)
+            # one pass over the decoded page, nesting the keys inline (c.dict_put imports itself on every call)
+            for (k,v) in c.progress(qmap, desc=f'Querying {name} map'):
+                if not hasattr(v, 'value'):
+                    continue
                 if not isinstance(k, tuple):
-                    k = [k]
-                if type(k) in [tuple,list]:
-                    # this is a double map
-                    k = [_k.value for _k in k]
-                if hasattr(v, 'value'):
-                    v = v.value
-                    c.dict_put(new_qmap, k, v)
+                    # this is a single map
+                    k = (k,)
+                d = new_qmap
+                for _k in k[:-1]:
+                    _k = _k.value
+                    if _k not in d:
+                        d[_k] = {}
+                    d = d[_k]
+                d[k[-1].value] = v.value
 
             self.put(path, new_qmap)
+            if block != None:
+                self.block_cache.put(path, new_qmap)
         
         else: 
             new_qmap = value
@@ -626,15 +805,33 @@ class Subspace(c.Module):
 
         return subnet2modules
     
-    def module2netuids(self, network:str='main', **kwargs):
-        subnet2modules = self.subnet2modules(network=network, **kwargs)
+    def module2netuids(self, network:str='main', update=False, **kwargs):
+        # one Name map over every subnet instead of pulling the modules of each subnet
+        netuid2names = self.query_map('Name', netuid='all', network=network, update=update, **kwargs)
         module2netuids = {}
-        for netuid, modules in subnet2modules.items():
-            for module in modules:
-                if module['name'] not in module2netuids:
-                    module2netuids[module['name']] = []
-                module2netuids[module['name']] += [netuid]
+        for netuid, uid2name in netuid2names.items():
+            for name in uid2name.values():
+                if name not in module2netuids:
+                    module2netuids[name] = []
+                module2netuids[name] += [netuid]
         return module2netuids
+
+    def key2netuid2uid(self, key:str = None, network:str = 'main', block:int = None, update=False, max_age=60, **kwargs) -> Dict[int, int]:
+        """
+        {netuid: uid} of every subnet the key is registered on, from one Keys map over all subnets
+        """
+        key = self.resolve_key_ss58(key)
+        netuid2uid2key = self.query_map('Keys', netuid='all', network=network, block=block, update=update, max_age=max_age, **kwargs)
+        netuid2uid = {}
+        for netuid, uid2key in netuid2uid2key.items():
+            for uid, uid_key in uid2key.items():
+                if uid_key == key:
+                    netuid2uid[netuid] = uid
+                    break
+        return netuid2uid
+    
+    def key2netuids(self, key:str = None, **kwargs) -> List[int]:
+        return list(self.key2netuid2uid(key=key, **kwargs).keys())
     
     
     @classmethod
@@ -662,6 +859,19 @@ class Subspace(c.Module):
 
         return x
     
+    def snapshot_account(self, key:str = None, netuid:int = 0, network:str = None, block:int = None) -> dict:
+        """
+        The free balance and the stake_to of a key (in nanos) from one state_queryStorageAt, 
+        both read at the same block. The values also land in the query cache.
+        """
+        key_ss58 = self.resolve_key_ss58(key)
+        netuid = self.resolve_netuid(netuid)
+        network = self.resolve_network(network)
+        account, stake_to = self.prefetch([('System', 'Account', [key_ss58]), 
+                                           ('SubspaceModule', 'StakeTo', [netuid, key_ss58])], network=network, block=block).values()
+        return {'balance': account['data']['free'], 
+                'stake_to': {k: v for k, v in (stake_to or [])}}
+
     def get_stake( self, key_ss58: str, block: Optional[int] = None, netuid:int = None , fmt='j', update=True ) -> Optional['Balance']:
         
         key_ss58 = self.resolve_key_ss58( key_ss58)
@@ -675,10 +885,9 @@ class Subspace(c.Module):
         for key, address in key2address.items():
             future = c.submit(self.get_balance, kwargs={'key': address}, timeout=timeout)
             futures.append(future)
-            c.print(f'{key}: {balance}')
         
         balances = c.wait(futures, timeout=timeout)
-        return balances
+        return dict(zip(key2address.keys(), balances))
 
     
 
@@ -995,9 +1204,14 @@ class Subspace(c.Module):
                 last_update['full'] = timestamp
             
 
-    def subnet_exists(self, subnet:str, network=None) -> bool:
-        subnets = self.subnets(network=network)
-        return bool(subnet in subnets)
+    def subnet_exists(self, subnet:Union[str, int], network=None) -> bool:
+        # answered from the in-memory subnet map, only a miss goes back to the chain
+        network = self.resolve_network(network)
+        for update in [False, True]:
+            subnet2netuid = self.cached_subnet2netuid(network=network, update=update)
+            if subnet in subnet2netuid or (isinstance(subnet, int) and subnet in subnet2netuid.values()):
+                return True
+        return False
 
     def subnet_emission(self, netuid:str = 0, network=None, block=None, update=False, **kwargs):
         emissions = self.emission(block=block, update=update, network=network, netuid=netuid, **kwargs)
@@ -1094,7 +1308,7 @@ class Subspace(c.Module):
         return ''.join([c.capitalize() for c in chunks])
 
 
-    def query_multi(self, params_batch , substrate=None, module='SubspaceModule', feature='SubnetNames', network='main'):
+    def query_multi(self, params_batch , substrate=None, module='SubspaceModule', feature='SubnetNames', network='main', block=None):
         substrate = substrate or self.get_substrate(network=network)
 
         # check if the params_batch is a list of lists
@@ -1107,8 +1321,9 @@ class Subspace(c.Module):
             params_batch[i] = p
             
         assert isinstance(params_batch, list), f"params_batch should be a list of lists"
-        multi_query = [substrate.create_storage_key(*p) for p in params_batch]
-        results = substrate.query_multi(multi_query)
+        multi_query = [self.storage_key(substrate, *p) for p in params_batch]
+        block_hash = None if block == None else self.block_hash(block, network=network)
+        results = substrate.query_multi(multi_query, block_hash=block_hash)
         return results
 
     def blocks_until_vote(self, netuid=0, **kwargs):
@@ -1120,34 +1335,61 @@ class Subspace(c.Module):
     def subnet_params(self, 
                     netuid=0,
                     network = 'main',
+                    block = None,
                     update = False,
                     max_age = 1000,
                     fmt:str='j', 
                     features  = subnet_features,
                     value_features = ['min_stake', 'max_stake'], 
+                    validate = False,
                     **kwargs
                     ) -> list:  
+        """
+        params of a subnet (or {netuid: params} for netuid='all'). A subnet that does not exist 
+        is None (left out for 'all'), detected from the read itself, validate checks it up front.
+        """
 
         netuid = self.resolve_netuid(netuid)
+        network = self.resolve_network(network)
+        if validate and netuid != 'all':
+            assert self.subnet_exists(netuid, network=network), f"Subnet {netuid} does not exist"
 
         path = f'query/{network}/SubspaceModule.SubnetParams.{netuid}'          
+        if block != None:
+            path = path + f'::block::{block}'
         subnet_params = self.get(path, None, max_age=max_age, update=update)
+        if subnet_params == None and netuid != 'all' and not update:
+            # a warm read of every subnet already has this one
+            all_params = self.get(path.replace(f'SubnetParams.{netuid}', 'SubnetParams.all'), None, max_age=max_age)
+            if all_params != None:
+                subnet_params = all_params.get(str(netuid), None)
         names = [self.feature2name(f) for f in features]
-        name2feature = dict(zip(names, features))
         if subnet_params == None:
-            block = self.block
-            subnet_params = {}
-            multi_query = [("SubspaceModule", f, []) for f in name2feature.values()]
-            results = self.query_multi(multi_query)
+            netuids = self.netuids(network=network, block=block) if netuid == 'all' else [netuid]
+            # every param of every requested subnet in one state_queryStorageAt (the params are maps over netuid)
+            multi_query = [("SubspaceModule", f, [_netuid]) for _netuid in netuids for f in features]
+            results = self.query_multi(multi_query, network=network, block=block)
+            subnet_params = {_netuid: {} for _netuid in netuids}
+            missing = set()
             for idx, (k, v) in enumerate(results):
-                subnet_params[names[idx]] = v.value
+                _netuid, feature = netuids[idx // len(features)], features[idx % len(features)]
+                if feature == 'SubnetNames' and not v.meta_info['result_found']:
+                    # every subnet has a name, no name means no subnet
+                    missing.add(_netuid)
+                subnet_params[_netuid][names[idx % len(features)]] = v.value
+            subnet_params = {k:v for k,v in subnet_params.items() if k not in missing}
+            if netuid != 'all':
+                if netuid in missing:
+                    return None
+                subnet_params = subnet_params[netuid]
             self.put(path, subnet_params)
+        elif netuid == 'all':
+            # json turns the netuid keys into strings
+            subnet_params = {int(k): v for k,v in subnet_params.items()}
 
-        for k in value_features:
-            subnet_params[k] = self.format_amount(subnet_params[k], fmt=fmt)
-        return subnet_params
-
-
+        for params in (subnet_params.values() if netuid == 'all' else [subnet_params]):
+            for k in value_features:
+                params[k] = self.format_amount(params[k], fmt=fmt)
         return subnet_params
 
 
@@ -1158,13 +1400,9 @@ class Subspace(c.Module):
 
 
     def subnet2params( self, network: int = None, block: Optional[int] = None ) -> Optional[float]:
-        netuids = self.netuids(network=network)
-        subnet2params = {}
-        netuid2subnet = self.netuid2subnet()
-        for netuid in netuids:
-            subnet = netuid2subnet[netuid]
-            subnet2params[subnet] = self.subnet_params(netuid=netuid, block=block)
-        return subnet2params
+        # one read of every subnet instead of one per netuid
+        netuid2params = self.subnet_params(netuid='all', network=network, block=block)
+        return {params['name']: params for params in netuid2params.values()}
     
     def subnet2emission( self, network: int = None, block: Optional[int] = None ) -> Optional[float]:
         subnet2emission = self.subnet2params(network=network, block=block)
@@ -1186,12 +1424,33 @@ class Subspace(c.Module):
                 key = key2addresss[key]
         
         assert c.valid_ss58_address(key), f"Invalid key {key}"
-        is_reged =  bool(self.query('Uids', block=block, params=[ netuid, key ]))
+        # uid 0 is a registered key too, so check membership instead of the truthiness of the uid
+        is_reged =  key in self.key_index(netuid=netuid, block=block)
         return is_reged
     is_reg = is_registered
 
     def get_uid( self, key: str, netuid: int = 0, block: Optional[int] = None, update=False, **kwargs) -> int:
-        return self.query( 'Uids', block=block, params=[ netuid, key ] , update=update, **kwargs)  
+        return self.key_index(netuid=netuid, block=block, update=update, **kwargs).get(key)
+
+    def key_index(self, 
+                  netuid: int = 0, 
+                  network: str = network, 
+                  block: Optional[int] = None, 
+                  update: bool = False, 
+                  max_age: int = 60, 
+                  **kwargs) -> Dict[str, int]:
+        """
+        {key_ss58: uid} of a subnet from one paged query_map over Keys, 
+        so checking many keys does not cost a Uids read per key.
+        """
+        path = f'key_index/{network}/{netuid}::block::{block}'
+        if block != None and not update and path in self.block_cache:
+            return self.block_cache.get(path)
+        uid2key = self.query_map('Keys', netuid=netuid, network=network, block=block, update=update, max_age=max_age, **kwargs)
+        key_index = {key: uid for uid, key in uid2key.items()}
+        if block != None:
+            self.block_cache.put(path, key_index)
+        return key_index
 
         
 
@@ -1231,13 +1490,15 @@ class Subspace(c.Module):
                     ) -> list:  
 
         path = f'query/{network}/SubspaceModule.GlobalParams'          
+        if block != None:
+            path = path + f'::block::{block}'
         subnet_params = self.get(path, None, max_age=max_age, update=update)
         names = [self.feature2name(f) for f in features]
         name2feature = dict(zip(names, features))
         if subnet_params == None:
             subnet_params = {}
             multi_query = [("SubspaceModule", f, []) for f in name2feature.values()]
-            results = self.query_multi(multi_query)
+            results = self.query_multi(multi_query, network=network, block=block)
             for idx, (k, v) in enumerate(results):
                 subnet_params[names[idx]] = v.value
             self.put(path, subnet_params)
@@ -1263,22 +1524,64 @@ class Subspace(c.Module):
                 account balance
         """
         key_ss58 = self.resolve_key_ss58( key )
-        self.resolve_network(network)
+        network = self.resolve_network(network)
 
-        result = self.query(
-                module='System',
-                name='Account',
-                params=[key_ss58],
-                block = block,
-                network=network,
-                update=update,
-                max_age=max_age
-            )
+        if block == None and update:
+            # head reads from many threads (validators, get_balances) share one query_multi
+            result = self.account_batcher(network=network).run(key_ss58)
+        else:
+            result = self.query(
+                    module='System',
+                    name='Account',
+                    params=[key_ss58],
+                    block = block,
+                    network=network,
+                    update=update,
+                    max_age=max_age
+                )
 
         return  self.format_amount(result['data']['free'] , fmt=fmt)
         
     get_balance = balance 
 
+    # network -> Batcher of System.Account reads at the head
+    account_batchers = {}
+
+    def account_batcher(self, network:str = 'main') -> Batcher:
+        if network not in self.account_batchers:
+            def get_accounts(keys:List[str]) -> List[dict]:
+                # the node answers once per storage key, so ask for each key once and map the answers back
+                key2account = self.read_rpc(lambda substrate: self.query_accounts(list(set(keys)), substrate=substrate), network=network, mode='http')
+                return [key2account[key] for key in keys]
+            self.account_batchers[network] = Batcher(get_accounts, max_batch=64)
+        return self.account_batchers[network]
+
+    def query_accounts(self, keys:List[str], substrate:SubstrateInterface, block_hash:str = None) -> Dict[str, dict]:
+        """
+        System.Account for many ss58 keys in one state_queryStorageAt. The pallet/function prefix and the 
+        value decoder come from one cached StorageKey, so each key is just blake2_128_concat(pubkey) 
+        on top of it instead of a walk through the metadata.
+        """
+        from scalecodec.base import ScaleBytes
+        from scalecodec.utils.ss58 import ss58_decode
+        from substrateinterface.utils.hasher import blake2_128_concat
+        # no params -> the bare twox128(System) + twox128(Account) prefix
+        account_key = self.storage_key(substrate, 'System', 'Account')
+        prefix = account_key.data
+        hex2key = {}
+        for key in keys:
+            storage_key = '0x' + (prefix + blake2_128_concat(bytes.fromhex(ss58_decode(key)))).hex()
+            hex2key[storage_key] = key
+        response = substrate.rpc_request('state_queryStorageAt', [list(hex2key.keys()), block_hash])
+        if 'error' in response:
+            raise Exception(response['error']['message'])
+        key2account = {}
+        for result_group in response['result']:
+            for storage_key, data in result_group['changes']:
+                data = None if data == None else ScaleBytes(data)
+                key2account[hex2key[storage_key]] = account_key.decode_scale_value(data).value
+        return key2account
+
     def get_account(self, key = None, network=None, update=True):
         self.resolve_network(network)
         key = self.resolve_key_ss58(key)
@@ -1335,7 +1638,8 @@ class Subspace(c.Module):
     
 
     def subnet_names(self, network='main' , search=None, update=False, block=None, max_age=60, **kwargs) -> Dict[str, str]:
-        records = self.query_map('SubnetNames', update=update, network=network, block=block, max_age=max_age, **kwargs)
+        # same SubnetNames map (and cache path) as netuid2subnet/netuids, so it is paged from the chain once
+        records = self.netuid2subnet(update=update, network=network, block=block, max_age=max_age, **kwargs)
         subnet_names = sorted(list(map(lambda x: str(x), records.values())))
         if search != None:
             subnet_names = [s for s in subnet_names if search in s]
@@ -1364,6 +1668,17 @@ class Subspace(c.Module):
 
     subnet_namespace = subnet2netuid
 
+    # network -> (timestamp, {subnet_name: netuid}), name lookups in resolve_netuid skip the disk read
+    subnet2netuid_cache = {}
+    subnet2netuid_max_age = 600
+
+    def cached_subnet2netuid(self, network=network, update=False) -> Dict[str, int]:
+        cached = self.subnet2netuid_cache.get(network)
+        if update or cached == None or c.time() - cached[0] > self.subnet2netuid_max_age:
+            cached = (c.time(), self.subnet2netuid(network=network, update=update))
+            self.subnet2netuid_cache[network] = cached
+        return cached[1]
+
     def resolve_netuid(self, netuid: int = None, network=network, update=False) -> int:
         '''
         Resolves a netuid to a subnet name.
@@ -1374,9 +1689,9 @@ class Subspace(c.Module):
             # If the netuid is not specified, use the default.
             return 0
         if isinstance(netuid, str):
-            subnet2netuid = self.subnet2netuid()
+            subnet2netuid = self.cached_subnet2netuid(network=network)
             if netuid not in subnet2netuid:
-                subnet2netuid =self.subnet2netuid(update=True)
+                subnet2netuid = self.cached_subnet2netuid(network=network, update=True)
             assert netuid in subnet2netuid, f"Subnet {netuid} not found in {subnet2netuid}"
             return subnet2netuid[netuid]
 
@@ -1466,25 +1781,61 @@ class Subspace(c.Module):
     def emission_per_epoch(self, netuid=None, network=None):
         return self.subnet(netuid=netuid, network=network)['emission']*self.epoch_time(netuid=netuid, network=network)
 
+    # network -> (time, number, hash) of the last head read from the chain
+    head_cache = {}
+
     def get_block(self, network='main', block_hash=None, max_age=8): 
         network = network or 'main'
+        if block_hash != None:
+            # a specific block, the head cache does not apply
+            self.resolve_network(network)
+            return self.substrate.get_block(block_hash=block_hash)['header']['number']
+        # the head is read many times per block, keep it in memory before falling back to disk and the chain
+        head = self.head_cache.get(network)
+        if head != None and c.time() - head[0] < max_age:
+            return head[1]
         path = f'cache/{network}.block'
         block = self.get(path, None, max_age=max_age)
         if block == None:
             self.resolve_network(network)
-            block_header = self.substrate.get_block( block_hash=block_hash)['header']
+            block_header = self.substrate.get_block()['header']
             block = block_header['number']
             block_hash = block_header['hash']
+            self.head_cache[network] = (c.time(), block, block_hash)
+            # block_hash(block) of the head is free now, but only for about a block (it is not final)
+            self.recent_block_hashes.put(f'block_hash/{network}/{block}', block_hash)
             self.put(path, block)
         return block
 
+    # block_hash/{network}/{block} -> hash of a block that is not finalized yet, a reorg can still replace it
+    recent_block_hashes = TTLCache(maxsize=256, ttl=8)
+    # network -> (time, number of the finalized head)
+    finalized_heads = {}
+
+    def finalized_block(self, network='main', max_age=8) -> int:
+        finalized_head = self.finalized_heads.get(network)
+        if finalized_head == None or c.time() - finalized_head[0] > max_age:
+            substrate = self.get_substrate(network=network)
+            finalized_head = (c.time(), substrate.get_block_number(substrate.get_chain_finalised_head()))
+            self.finalized_heads[network] = finalized_head
+        return finalized_head[1]
+
     def block_hash(self, block = None, network='main'): 
         if block == None:
             block = self.block
 
-        substrate = self.get_substrate(network=network)
-        
-        return substrate.get_block_hash(block)
+        # resolve each block number once, the many reads at the same block reuse the hash
+        path = f'block_hash/{network}/{block}'
+        block_hash = self.block_cache.get(path) or self.recent_block_hashes.get(path)
+        if block_hash == None:
+            substrate = self.get_substrate(network=network)
+            block_hash = substrate.get_block_hash(block)
+            if block_hash != None:
+                # only a finalized number -> hash is kept for good, newer blocks can be reorged
+                finalized_head = self.finalized_heads.get(network, (0, -1))[1]
+                is_final = block <= finalized_head or block <= self.finalized_block(network=network)
+                (self.block_cache if is_final else self.recent_block_hashes).put(path, block_hash)
+        return block_hash
     
 
     def seconds_per_epoch(self, netuid=None, network=None):
@@ -1508,16 +1859,69 @@ class Subspace(c.Module):
             module_key = self.name2key(name=module, network=network, netuid=netuid, **kwargs)
         netuid = self.resolve_netuid(netuid)
         json={'id':1, 'jsonrpc':'2.0',  'method': 'subspace_getModuleInfo', 'params': [module_key, netuid]}
-        module = None
+
+        def get_module_info():
+            import requests
+            for i in range(trials):
+                try:
+                    return requests.post(url,  json=json).json()
+                except Exception as e:
+                    c.print(e)
+            return None
+
+        module = self.in_flight.run(('subspace_getModuleInfo', network, module_key, netuid), get_module_info)
+        assert module != None, f"Failed to get module {module_key} after {trials} trials"
+        module = self.format_module_info(module['result'], fmt=fmt, block=block, lite=lite)
+        assert module['key'] == module_key, f"Key mismatch {module['key']} != {module_key}"
+        return module
+
+    def get_module_infos(self, 
+                    keys:List[str],
+                    netuid=0,
+                    network='main',
+                    trials = 4,
+                    fmt='j',
+                    mode = 'http',
+                    block = None,
+                    lite = True, **kwargs ) -> List['ModuleInfo']:
+        """
+        get_module for many keys in one JSON-RPC batch (one POST with a list of requests), 
+        keys the node has no module for are left out.
+        """
+        import requests
+        url = self.resolve_url(network=network, mode=mode)
+        netuid = self.resolve_netuid(netuid)
+        block = block or self.block
+        batch = [{'id':i, 'jsonrpc':'2.0',  'method': 'subspace_getModuleInfo', 'params': [key, netuid]} for i, key in enumerate(keys)]
+        responses = None
         for i in range(trials):
             try:
-                module = requests.post(url,  json=json).json()
+                responses = requests.post(url,  json=batch).json()
                 break
             except Exception as e:
                 c.print(e)
+        modules = []
+        if not isinstance(responses, list):
+            # one error object (or a node without batch support), ask for each key on its own
+            c.print(f'Batch of {len(keys)} modules failed ({responses}), falling back to one request per key', color='yellow')
+            for key in keys:
+                try:
+                    modules.append(self.get_module(key, netuid=netuid, network=network, trials=trials, fmt=fmt, mode=mode, block=block, lite=lite))
+                except Exception as e:
+                    c.print(f'Failed to get module {key} ({e})', color='red')
+            return modules
+        # the batch reply can come back in any order, and entries without a valid id cant be matched to a key
+        responses = [r for r in responses if isinstance(r, dict) and isinstance(r.get('id'), int) and 0 <= r['id'] < len(keys)]
+        for response in sorted(responses, key=lambda r: r['id']):
+            if response.get('result') == None:
                 continue
-        assert module != None, f"Failed to get module {module_key} after {trials} trials"
-        module = {**module['result']['stats'], **module['result']['params']}
+            module = self.format_module_info(response['result'], fmt=fmt, block=block, lite=lite)
+            if module['key'] == keys[response['id']]:
+                modules.append(module)
+        return modules
+
+    def format_module_info(self, result:dict, fmt='j', block=None, lite=True) -> 'ModuleInfo':
+        module = {**result['stats'], **result['params']}
         # convert list of u8 into a string Vector<u8> to a string
         module['name'] = self.vec82str(module['name'])
         module['address'] = self.vec82str(module['address'])
@@ -1531,7 +1935,6 @@ class Subspace(c.Module):
         if lite :
             features = self.module_features + ['stake', 'vote_staleness']
             module = {f: module[f] for f in features}
-        assert module['key'] == module_key, f"Key mismatch {module['key']} != {module_key}"
         return module
 
 
@@ -1553,11 +1956,27 @@ class Subspace(c.Module):
         netuid = self.resolve_netuid(netuid)
         block = block or self.block
         if netuid == 'all':
-            all_keys = self.keys(update=update, netuid=netuid)
-            modules = {}
-            for netuid in self.netuids():
-                module = self.get_modules(keys=all_keys[netuid], netuid=netuid,   **kwargs)
-                modules[netuid] = module.get(netuid, []) + [module]
+            # keys can be passed as {netuid: keys}
+            all_keys = keys if isinstance(keys, dict) else self.keys(update=update, netuid=netuid)
+            # fan out the key batches of every subnet at once (leaf tasks only, so no worker waits on another)
+            futures = []
+            future2netuid = {}
+            for _netuid, keys in all_keys.items():
+                for key_batch in c.chunk(keys, chunk_size=batch_size):
+                    f = c.submit(self.get_modules, kwargs=dict(keys=key_batch,
+                                                            block=block, 
+                                                            network=network, 
+                                                            netuid=_netuid, 
+                                                            fmt=fmt,
+                                                            batch_size=len(key_batch) + 1,
+                                                            timeout=timeout), timeout=timeout)
+                    futures += [f]
+                    future2netuid[f] = _netuid
+            modules = {_netuid: [] for _netuid in all_keys}
+            for f in c.as_completed(futures, timeout=timeout):
+                module_batch = f.result()
+                if isinstance(module_batch, list):
+                    modules[future2netuid[f]] += [m for m in module_batch if isinstance(m, dict) and 'name' in m]
             return modules
         if keys == None:
             keys = self.keys(update=update, netuid=netuid)
@@ -1586,27 +2005,17 @@ class Subspace(c.Module):
             c.print('No keys found')
             return []
 
-        progress_bar = c.tqdm(total=len(keys), desc=f'Querying {len(keys)} keys for modules')
-        modules = []
-        for key in keys:
-            module = self.module_info(module=key, block=block, netuid=netuid, network=network, fmt=fmt, **kwargs)
-            if isinstance(module, dict) and 'name' in module:
-                modules.append(module)
-                progress_bar.update(1)
-        
-        return modules
+        # the whole batch is one round trip
+        modules = self.get_module_infos(keys=keys, block=block, netuid=netuid, network=network, fmt=fmt, **kwargs)
+        return [m for m in modules if 'name' in m]
     
         
     def my_modules(self, search=None, netuid=0, generator=False,  **kwargs):
         keys = self.my_keys(netuid=netuid, search=search)
         if netuid == 'all':
-            modules = {}
-            all_keys = keys 
-            for netuid, keys in enumerate(all_keys):
-                try:
-                    modules[netuid]= self.get_modules(keys=keys, netuid=netuid, **kwargs)
-                except Exception as e:
-                    c.print(e)
+            # get_modules fans out over every subnet in one go
+            all_keys = {netuid: keys for netuid, keys in enumerate(keys) if len(keys) > 0}
+            modules = self.get_modules(keys=all_keys, netuid='all', **kwargs)
             modules = {k: v for k,v in modules.items() if len(v) > 0 }
             return modules
         
@@ -1647,9 +2056,13 @@ class Subspace(c.Module):
                 max_age=1000,
                 subnet = None,
                 vector_features =['dividends', 'incentive', 'trust', 'last_update', 'emission'],
+                generator = False,
                 **kwargs
                 ) -> Dict[str, 'ModuleInfo']:
-    
+        """
+        modules of a subnet. generator=True yields them one at a time, so a caller that stops 
+        early or only keeps a few fields never holds every module dict at once.
+        """
 
         name2feature = {
             'emission': 'Emission',
@@ -1711,28 +2124,60 @@ class Subspace(c.Module):
                     break
 
             uid2key = state['key']
-            uids = list(uid2key.keys())
-            modules = []
-            for uid in uids:
-                module = {}
-                for feature in features:
-                    if uid in state[feature] or isinstance(state[feature], list):
-                        module[feature] = state[feature][uid]
-                    else:
-                        uid_key = uid2key[uid]
-                        module[feature] = state[feature].get(uid_key, name2default.get(uid_key, None))
-                modules.append(module)
-            self.put(path, modules)
+            def build_modules():
+                for uid in uid2key.keys():
+                    module = {}
+                    for feature in features:
+                        if uid in state[feature] or isinstance(state[feature], list):
+                            module[feature] = state[feature][uid]
+                        else:
+                            uid_key = uid2key[uid]
+                            module[feature] = state[feature].get(uid_key, name2default.get(feature, None))
+                    yield module
+            if generator:
+                modules = build_modules()
+            else:
+                modules = list(build_modules())
+                self.put(path, modules)
 
-            
-        if len(modules) > 0:
-            for i in range(len(modules)):
-                modules[i] = self.format_module(modules[i], fmt=fmt)
+        def format_modules(modules):
+            for module in modules:
+                module = self.format_module(module, fmt=fmt)
+                if search == None or search in module['name']:
+                    yield module
 
-        if search != None:
-            modules = [m for m in modules if search in m['name']]
+        if generator:
+            return format_modules(modules)
+        return list(format_modules(modules))
 
-        return modules
+    def modules_soa(self, netuid: int = 0, network = 'main', block: Optional[int] = None, max_age=1000, **kwargs) -> Dict[str, 'np.ndarray']:
+        """
+        The modules of a subnet as one array per feature (row i is uid i), so scans like
+        "which uid has this key" or "total emission" are vectorized instead of looping over dicts.
+        """
+        import numpy as np
+        modules = self.modules(netuid=netuid, network=network, block=block, max_age=max_age, fmt='nano', **kwargs)
+        features = list(modules[0].keys()) if len(modules) > 0 else []
+        soa = {'uid': np.arange(len(modules))}
+        for feature in features:
+            column = [m[feature] for m in modules]
+            if all([isinstance(v, (int, float)) for v in column]):
+                soa[feature] = np.asarray(column)
+            elif all([isinstance(v, str) for v in column]):
+                soa[feature] = np.asarray(column, dtype=str)
+            else:
+                # nested values (stake_from pairs) stay python objects
+                soa[feature] = np.empty(len(column), dtype=object)
+                for i, v in enumerate(column):
+                    soa[feature][i] = v
+        return soa
+
+    @staticmethod
+    def soa2module(soa: Dict[str, 'np.ndarray'], idx: int) -> dict:
+        """
+        Rebuilds the module dict of one row, for callers that need the object view.
+        """
+        return {k: v[idx].item() if hasattr(v[idx], 'item') else v[idx] for k, v in soa.items()}
 
     
 
@@ -2418,6 +2863,8 @@ class Subspace(c.Module):
         nonce=None,
         tag = None,
         max_age = 1000,
+        trials = 4,
+        max_delay = 8,
     **kwargs
     ) -> bool:
 
@@ -2427,10 +2874,14 @@ class Subspace(c.Module):
             name = f'{module}::{tag}'
         # resolve module name and tag if they are in the server_name
         serve_info = None
+        delay = 0.25
         while not c.server_exists(name):
             if serve_info == None:
                 serve_info =  c.serve(name, **kwargs)
                 address = serve_info['address']
+            else:
+                c.sleep(delay + c.random_float(0, delay))
+                delay = min(delay * 2, max_delay)
         namespace = c.get_namespace()
         network =self.resolve_network(network)
         address = address or namespace.get(name,address)
@@ -2454,12 +2905,18 @@ class Subspace(c.Module):
         # require prompt to create new subnet        
                 
         stake = stake or 0
+        # fetch the registration requirements in one round trip
+        prefetch = [('SubspaceModule', 'MinBurn', []), ('SubspaceModule', 'MinStake', [netuid])]
+        if c.key_exists(name):
+            prefetch += [('System', 'Account', [c.get_key(name).ss58_address])]
+        self.prefetch(prefetch, network=network)
+
         min_register_stake = self.min_register_stake(netuid=netuid, network=network)
         stake = max(min_register_stake, stake)
         
         if c.key_exists(name):
             mkey = c.get_key(name)
-            mkey_balance = self.get_balance(key=mkey.ss58_address, network=network)
+            mkey_balance = self.get_balance(key=mkey.ss58_address, network=network, update=False, max_age=10)
             if mkey_balance > stake:
                 c.print(f'Using {name} key to register {name} with {stake} stake')
                 key = mkey
@@ -2482,10 +2939,40 @@ class Subspace(c.Module):
                     'metadata': b'{}',
                 }
         
-        # create extrinsic call
-        response = self.compose_call('register', params=params, key=key, wait_for_inclusion=wait_for_inclusion, wait_for_finalization=wait_for_finalization, nonce=nonce)
+        # create extrinsic call, only retrying transport errors (a failed dispatch will fail again)
+        delay = 0.25
+        for trial in range(trials):
+            try:
+                # a dispatch that fails comes back as the receipt's error_message and is not retried
+                response = self.compose_call('register', params=params, key=key, wait_for_inclusion=wait_for_inclusion, wait_for_finalization=wait_for_finalization, nonce=nonce)
+                break
+            except SubmittedError as e:
+                # the registration may still land, sending it again could register twice
+                return {'success': False, 'error': str(e), 'msg': f'Sent the registration of {name} but could not confirm it'}
+            except Exception as e:
+                # errors before the extrinsic went out (connection, compose) and pool rejections
+                if trial == trials - 1 or self.is_fatal_tx_error(e):
+                    return {'success': False, 'error': str(e), 'msg': f'Failed to register {name}'}
+                c.print(f'Failed to register {name} ({e}), retrying in {delay:.2f}s', color='red')
+                c.sleep(delay + c.random_float(0, delay))
+                delay = min(delay * 2, max_delay)
         return response
 
+    # transaction pool rejection codes that retrying cannot fix: 
+    # invalid (fees, signature, block limits), temporarily banned, already imported, priority too low (same nonce in the pool)
+    fatal_tx_codes = [1010, 1012, 1013, 1014]
+
+    def is_fatal_tx_error(self, e:Exception) -> bool:
+        if not isinstance(e, SubstrateRequestException):
+            return False
+        error = e.args[0] if len(e.args) > 0 else None
+        if not isinstance(error, dict):
+            return False
+        # an outdated (stale) nonce is invalid too, but the retry fetches a fresh one
+        if error.get('code') == 1010 and 'outdated' in str(error.get('data', '')).lower():
+            return False
+        return error.get('code') in self.fatal_tx_codes
+
     reg = register
 
     ##################
@@ -2498,6 +2985,7 @@ class Subspace(c.Module):
         key: str = None,
         network : str = None,
         nonce= None,
+        timeout: int = 20,
         **kwargs
         
     ) -> bool:
@@ -2510,15 +2998,29 @@ class Subspace(c.Module):
         key = self.resolve_key(key)
         network = self.resolve_network(network)
         dest = self.resolve_key_ss58(dest)
-        amount = self.to_nanos(amount) # convert to nano (10^9 nanos = 1 token)
+        # convert to integer nanos (10^9 nanos = 1 token) once, so the checks below are plain int math
+        # (round, as int() would drop a nano from amounts like 0.3 * 1e9 = 299999999.99999994)
+        amount = round(self.to_nanos(amount))
+        params = {'dest': dest, 'value': amount}
+
+        # fail here instead of paying the fee for a transfer that cannot go through
+        # the balance and the fee estimate are independent, so they are fetched at the same time
+        executor = c.executor()
+        futures = [executor.submit(fn=self.get_balance, kwargs=dict(key=key.ss58_address, network=network, fmt='nano'), timeout=timeout),
+                   executor.submit(fn=self.estimate_fee, kwargs=dict(fn='transfer', params=params, key=key, module='Balances', network=network), timeout=timeout)]
+        balance, fee = [f.result(timeout=timeout) for f in futures]
+        for result in [balance, fee]:
+            # the executor returns failed tasks as error dicts
+            if c.is_error(result):
+                return result
+        required = amount + int(fee)
+        if int(balance) < required:
+            return {'success': False, 'msg': f'Insufficient balance {balance} < {required} (amount + fee in nanos)'}
 
         response = self.compose_call(
             module='Balances',
             fn='transfer',
-            params={
-                'dest': dest, 
-                'value': amount
-            },
+            params=params,
             key=key,
             nonce = nonce,
             **kwargs
@@ -2635,6 +3137,7 @@ class Subspace(c.Module):
         ip = c.ip(max_age=max_ip_age)
         if module_info['key'] == None:
             return {'success': False, 'msg': 'not registered'}
+        chain_name = module_info['name']
         module_info['name'] = module
         name = name or module_info['name']
         delegation_fee = fee or delegation_fee or module_info['delegation_fee']
@@ -2646,7 +3149,9 @@ class Subspace(c.Module):
             c.print(c.mv_key(module_info['name'], name))
             address = c.serve(name)['address']
 
-        current_address = c.get_namespace().get(name, c.serve(name)['address'])
+        # only serve the module when it is not in the namespace (a dict.get default would serve it every time)
+        namespace = c.get_namespace()
+        current_address = namespace[name] if name in namespace else c.serve(name)['address']
 
         if module_info['address'] != current_address:
             address = current_address
@@ -2662,6 +3167,10 @@ class Subspace(c.Module):
             'metadata': b'{}',
         }
 
+        # skip the extrinsic if the chain already has these values, cheapest comparison first
+        if address == module_info['address'] and name == chain_name and delegation_fee == module_info['delegation_fee']:
+            return {'success': True, 'msg': f'Module {name} already up to date'}
+
         reponse  = self.compose_call('update_module',params=params, key=key, nonce=nonce, tip=tip)
 
         # IF SUCCESSFUL, MOVE THE KEYS, AS THIS IS A NON-REVERSIBLE OPERATION
@@ -2828,11 +3337,13 @@ class Subspace(c.Module):
 
         # Flag to indicate if we are using the wallet's own hotkey.
         
+        snapshot = self.snapshot_account(key.ss58_address, netuid=netuid, network=network)
         if amount == None:
-            amount = self.get_balance( key.ss58_address , fmt='nano') - existential_deposit*10**9
+            amount = snapshot['balance'] - existential_deposit*10**9
         else:
             amount = int(self.to_nanos(amount - existential_deposit))
         assert amount > 0, f"Amount must be greater than 0 and greater than existential deposit {existential_deposit}"
+        assert amount <= snapshot['balance'], f"Amount {amount} is more than the balance {snapshot['balance']} (nanos)"
         
         # Get current stake
         params={
@@ -2841,7 +3352,8 @@ class Subspace(c.Module):
                     'module_key': module_key
                     }
 
-        return self.compose_call('add_stake',params=params, key=key)
+        # kwargs reach compose_call, so callers can stop at inclusion (wait_for_finalization=False)
+        return self.compose_call('add_stake',params=params, key=key, **kwargs)
 
 
 
@@ -2878,8 +3390,7 @@ class Subspace(c.Module):
 
 
         if isinstance(module, int):
-            module = amount
-            amount = module
+            module, amount = amount, module
 
         assert module != None or amount != None, f"Must provide a module or an amount"
 
@@ -2892,11 +3403,12 @@ class Subspace(c.Module):
         else: 
             raise Exception('Invalid input')
 
+        staked = self.snapshot_account(key.ss58_address, netuid=netuid, network=network)['stake_to'].get(module_key, 0)
         if amount == None:
-            stake_to = self.get_stake_to(netuid=netuid, names = False, fmt='nano', key=module_key)
-            amount = stake_to[module_key] - 100000
+            amount = staked - 100000
         else:
             amount = int(self.to_nanos(amount))
+        assert amount <= staked, f"Amount {amount} is more than the stake {staked} to {module_key} (nanos)"
         # convert to nanos
         params={
             'amount': amount ,
@@ -3219,11 +3731,73 @@ class Subspace(c.Module):
         max_age = 100,
         **kwargs
     ) -> bool:
-        import torch
 
         network = self.resolve_network(network)
         netuid = self.resolve_netuid(netuid)
         key = self.resolve_key(key)
+        params = self.weights_params(modules=modules, weights=weights, uids=uids, netuid=netuid, key=key, 
+                                     network=network, update=update, min_value=min_value, max_value=max_value)
+        response = self.compose_call('set_weights',params = params , key=key, **kwargs)
+            
+        if response['success']:
+            return {'success': True, 
+                    'message': 'Voted', 
+                    'num_uids': len(params['uids'])}
+        
+        else:
+            return response
+
+    vote = set_weights
+
+    def set_weights_many(
+        self,
+        votes: List[dict],
+        key: 'c.key' = None,
+        network = None,
+        update=False,
+        min_value = 0,
+        max_value = 1,
+        **kwargs
+    ) -> bool:
+        """
+        Sets the weights of several subnets in one Utility.batch_all extrinsic (one signature, one finalization wait).
+        votes: [{'netuid': 0, 'uids': [...], 'weights': [...]}, ...], each vote takes the arguments of set_weights
+        """
+        network = self.resolve_network(network)
+        key = self.resolve_key(key)
+        calls = []
+        for vote in votes:
+            vote = {'update': update, 'min_value': min_value, 'max_value': max_value, **vote}
+            vote['netuid'] = self.resolve_netuid(vote.get('netuid', 0))
+            params = self.weights_params(key=key, network=network, **vote)
+            calls.append({'call_module': 'SubspaceModule', 'call_function': 'set_weights', 'call_args': params})
+
+        # batch_all reverts every vote if one of them fails
+        response = self.compose_call('batch_all', params={'calls': calls}, module='Utility', key=key, **kwargs)
+
+        if response['success']:
+            return {'success': True, 
+                    'message': f'Voted on {len(calls)} subnets', 
+                    'netuids': [call['call_args']['netuid'] for call in calls]}
+        else:
+            return response
+
+    def weights_params(
+        self,
+        modules: Union['torch.LongTensor', list] = None,
+        weights: Union['torch.FloatTensor', list] = None,
+        uids = None,
+        netuid: int = 0,
+        key: 'c.key' = None,
+        network = None,
+        update=False,
+        min_value = 0,
+        max_value = 1,
+    ) -> dict:
+        """
+        Builds the set_weights call params (uids and u16 weights) for a subnet.
+        """
+        import numpy as np
         global_params = self.global_params( network=network)
         subnet_params = self.subnet_params( netuid = netuid )
         module_info = self.module_info(key.ss58_address, netuid=netuid)
@@ -3236,12 +3810,15 @@ class Subspace(c.Module):
         if modules == None:
             modules = c.shuffle(self.uids(netuid=netuid, update=update))
         # checking if the "uids" are passed as names -> strings
-        for i, module in enumerate(modules):
-            if isinstance(module, str):
-                if module in key2name:
-                    modules[i] = key2name[module]
-                elif module in name2uid:
-                    modules[i] = name2uid[module]
+        if any([isinstance(module, str) for module in modules]):
+            key2uid = self.key_index(netuid=netuid, network=network)
+            name2uid = self.name2uid(netuid=netuid, network=network)
+            for i, module in enumerate(modules):
+                if isinstance(module, str):
+                    if module in key2uid:
+                        modules[i] = key2uid[module]
+                    elif module in name2uid:
+                        modules[i] = name2uid[module]
                     
         uids = modules
         
@@ -3260,35 +3837,23 @@ class Subspace(c.Module):
         uids = list(uid2weight.keys())
         weights = list(uid2weight.values())
         assert len(uids) == len(weights), f"Length of uids {len(uids)} must be equal to length of weights {len(weights)}"
-        uids = torch.tensor(uids)[:n]
-        weights = torch.tensor(weights)[:n]
+        uids = np.asarray(uids, dtype=np.int64)[:n]
+        weights = np.asarray(weights, dtype=np.float64)[:n]
         weights = weights / weights.sum() # normalize the weights between 0 and 1
 
         # STEP 2: CLAMP THE WEIGHTS BETWEEN 0 AND 1 WITH MIN AND MAX VALUES
         assert min_value >= 0 and max_value <= 1, f"min_value and max_value must be between 0 and 1"
-        weights = torch.clamp(weights, min_value, max_value) # min_value and max_value are between 0 and 1
+        weights = np.clip(weights, min_value, max_value) # min_value and max_value are between 0 and 1
 
-        weights = weights * (2**16 - 1)
-        weights = list(map(lambda x : int(min(x, U16_MAX)), weights.tolist()))
-        uids = list(map(int, uids.tolist()))
+        # STEP 3: QUANTIZE TO U16 IN ONE PASS
+        weights = np.minimum(weights * U16_MAX, U16_MAX).astype(np.int64).tolist()
+        uids = uids.tolist()
 
         params = {'uids': uids,
                   'weights': weights, 
                   'netuid': netuid}
 
-        response = self.compose_call('set_weights',params = params , key=key, **kwargs)
-            
-        if response['success']:
-            return {'success': True, 
-                    'message': 'Voted', 
-                    'num_uids': len(uids)}
-        
-        else:
-            return response
-
-
-
-    vote = set_weights
+        return params
 
     def register_servers(self,  search=None, infos=None,  netuid = 0, timeout=60, max_age=None,  key=None, update=False, **kwargs):
         '''
@@ -3576,12 +4141,6 @@ class Subspace(c.Module):
             return c.connect(remote_module).compose_call(**kwargs)
 
         params = {} if params == None else params
-        if verbose:
-            kwargs = c.locals2kwargs(locals())
-            kwargs['verbose'] = False
-            c.status(f":satellite: Calling [bold]{fn}[/bold]")
-            return self.compose_call(**kwargs)
-
         start_time = c.datetime()
         ss58_address = key.ss58_address
         paths = {m: f'history/{self.network}/{ss58_address}/{m}/{start_time}.json' for m in ['complete', 'pending']}
@@ -3591,49 +4150,85 @@ class Subspace(c.Module):
                 call_function=fn,
                 call_params=params,
         )
-        c.print(f'Sending 📡 using 🔑(ss58={key.ss58_address}, name={key.path})🔑', compose_kwargs,color=color)
+        if verbose:
+            c.print(f'Sending 📡 using 🔑(ss58={key.ss58_address}, name={key.path})🔑', compose_kwargs,color=color)
         tx_state = dict(status = 'pending',start_time=start_time, end_time=None)
 
         self.put_json(paths['pending'], tx_state)
 
-        substrate = self.get_substrate(network=network, mode='ws')
-        call = substrate.compose_call(**compose_kwargs)
+        substrate = self.ensure_alive(self.get_substrate(network=network, mode='ws'))
+
+        def create_call():
+            call = self.create_call(substrate=substrate, **compose_kwargs)
+            if sudo:
+                call = self.create_call(
+                    substrate=substrate,
+                    call_module='Sudo',
+                    call_function='sudo',
+                    call_params={
+                        'call': call,
+                    }
+                )
+            if unchecked_weight:
+                # uncheck the weights for set_code
+                call = self.create_call(
+                    substrate=substrate,
+                    call_module="Sudo",
+                    call_function="sudo_unchecked_weight",
+                    call_params={
+                        "call": call,
+                        'weight': (0,0)
+                    },
+                )
+            return call
 
-        if sudo:
-            call = substrate.compose_call(
-                call_module='Sudo',
-                call_function='sudo',
-                call_params={
-                    'call': call,
-                }
-            )
-        if unchecked_weight:
-            # uncheck the weights for set_code
-            call = substrate.compose_call(
-                call_module="Sudo",
-                call_function="sudo_unchecked_weight",
-                call_params={
-                    "call": call,
-                    'weight': (0,0)
-                },
-            )
+        runtime_version = substrate.runtime_version
+        call = create_call()
         # get nonce 
         if tip < max_tip:
             tip = tip * 1e9
+        if nonce == None:
+            # resolved here (create_signed_extrinsic would do the same) so a failed submit can be checked against it
+            nonce = substrate.get_account_nonce(key.ss58_address) or 0
         extrinsic = substrate.create_signed_extrinsic(call=call,keypair=key,nonce=nonce, tip=tip)
-
-        response = substrate.submit_extrinsic(extrinsic=extrinsic,
-                                                wait_for_inclusion=wait_for_inclusion, 
-                                                wait_for_finalization=wait_for_finalization)
-
-        if wait_for_finalization:
-            if process_events:
-                response.process_events()
-
+        if substrate.runtime_version != runtime_version:
+            # the runtime was upgraded since the call was encoded, encode it again with the new metadata
+            call = create_call()
+            extrinsic = substrate.create_signed_extrinsic(call=call,keypair=key,nonce=nonce, tip=tip)
+
+        # waiting is done by an author_submitAndWatchExtrinsic subscription on the pooled websocket (no polling),
+        # which is why compose_call always takes the ws connection
+        try:
+            response = substrate.submit_extrinsic(extrinsic=extrinsic,
+                                                    wait_for_inclusion=wait_for_inclusion, 
+                                                    wait_for_finalization=wait_for_finalization)
+        except SubstrateRequestException as e:
+            # the node answered with an error, the extrinsic is not in the pool
+            raise e
+        except Exception as e:
+            # the send itself can fail (nothing reached the node, safe to retry) or the wait after it. 
+            # the next index counts the pool too, so it only moved past our nonce if the extrinsic (or one with its nonce) went out
+            try:
+                check_substrate = self.ensure_alive(self.get_substrate(network=network, mode='ws'))
+                is_sent = check_substrate.rpc_request('system_accountNextIndex', [key.ss58_address])['result'] > nonce
+            except Exception:
+                # cant tell, assume it went out rather than risk sending it twice
+                is_sent = True
+            if is_sent:
+                raise SubmittedError(f'Sent {module}.{fn} ({extrinsic.extrinsic_hash.hex()}) but lost track of it ({e})') from e
+            raise e
+
+        # the receipt decodes the block (extrinsics + every event) the first time is_success is read,
+        # so only touch it when the extrinsic was waited on (a fire and forget receipt has no block) and the caller asked for the events
+        if (wait_for_inclusion or wait_for_finalization) and process_events:
             if response.is_success:
                 response =  {'success': True, 'tx_hash': response.extrinsic_hash, 'msg': f'Called {module}.{fn} on {self.network} with key {key.ss58_address}'}
             else:
                 response =  {'success': False, 'error': response.error_message, 'msg': f'Failed to call {module}.{fn} on {self.network} with key {key.ss58_address}'}
+        elif wait_for_inclusion or wait_for_finalization:
+            # included, but the events were not read, so the dispatch result is not checked (events_checked=False)
+            response =  {'success': True, 'events_checked': False, 'tx_hash': response.extrinsic_hash, 'block_hash': response.block_hash, 
+                         'msg': f'Included {module}.{fn} on {self.network} with key {key.ss58_address}, the dispatch result was not checked'}
         else:
             response =  {'success': True, 'tx_hash': response.extrinsic_hash, 'msg': f'Called {module}.{fn} on {self.network} with key {key.ss58_address}'}
         
@@ -3644,7 +4239,57 @@ class Subspace(c.Module):
         self.rm(paths['pending'])
         self.put_json(paths['complete'], tx_state)
         return response
-            
+        
+    # (network, module, fn, runtime version) -> partial fee in nanos, a call's fee only changes with the runtime
+    fee_cache = {}
+    default_fee = int(2e7)
+
+    def estimate_fee(self, 
+                     fn:str, 
+                     params:dict = None, 
+                     key:str = None, 
+                     module:str = 'SubspaceModule', 
+                     network:str = None, 
+                     update:bool = False) -> int:
+        """
+        Estimates the fee (in nanos) of a call with payment_queryInfo, cached per runtime version.
+        """
+        key = self.resolve_key(key)
+        network = self.resolve_network(network)
+        substrate = self.get_substrate(network=network)
+        if substrate.runtime_version == None:
+            # a fresh connection has no runtime yet, the key needs its version
+            substrate.init_runtime()
+        fee_key = (network, module, fn, substrate.runtime_version)
+        if not update and fee_key in self.fee_cache:
+            return self.fee_cache[fee_key]
+
+        try:
+            call = self.create_call(substrate=substrate, call_module=module, call_function=fn, call_params=params)
+            fee = substrate.get_payment_info(call=call, keypair=key)['partialFee']
+        except Exception as e:
+            c.print(f'Failed to estimate the fee of {module}.{fn}, assuming {self.default_fee} ({e})', color='red')
+            return self.default_fee
+
+        self.fee_cache[fee_key] = fee
+        return fee
+
+    def create_call(self, substrate:SubstrateInterface, call_module:str, call_function:str, call_params:dict = None):
+        """
+        substrate.compose_call re-initializes the runtime (3 rpcs) before encoding every call.
+        Once the metadata is loaded the call is encoded against it directly, create_signed_extrinsic
+        refreshes the runtime right after anyway.
+        """
+        if substrate.metadata == None:
+            return substrate.compose_call(call_module=call_module, call_function=call_function, call_params=call_params)
+        call = substrate.runtime_config.create_scale_object(type_string='Call', metadata=substrate.metadata)
+        call.encode({
+            'call_module': call_module,
+            'call_function': call_function,
+            'call_args': call_params or {}
+        })
+        return call
+
     def tx_history(self, key:str=None, mode='complete',network=network, **kwargs):
         key_ss58 = self.resolve_key_ss58(key)
         assert mode in ['pending', 'complete']
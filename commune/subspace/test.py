@@ -1,4 +1,7 @@
+import time
+import threading
 import commune as c
+from commune.subspace.rpc_cache import BlockCache, InFlight, Batcher, TTLCache
 
 class Test(c.m('subspace')):
 
@@ -51,3 +54,107 @@ class Test(c.m('subspace')):
         
 
 
+    def test_block_cache(self):
+        cache = BlockCache(maxsize=2)
+        cache.put('a', {'uids': [1, 2]})
+        cache.put('b', 2)
+        cache.get('a') # a is now the most recent, b goes first
+        cache.put('c', 3)
+        assert 'b' not in cache and 'a' in cache and 'c' in cache, f'{list(cache.cache)}'
+        # the cache hands out copies, editing a result does not change the cached value
+        value = cache.get('a')
+        value['uids'].append(3)
+        assert cache.get('a') == {'uids': [1, 2]}, cache.get('a')
+        return {'msg': 'block_cache test passed', 'success': True}
+
+    def test_ttl_cache(self):
+        cache = TTLCache(maxsize=8, ttl=0.1)
+        cache.put('a', 1)
+        cache.put('b', 2, ttl=10)
+        assert cache.get('a') == 1 and 'a' in cache
+        time.sleep(0.2)
+        assert cache.get('a') == None and 'a' not in cache, 'a should have expired'
+        assert cache.get('b') == 2, 'b has its own ttl'
+        # a cached None reads as a miss
+        cache.put('c', None)
+        assert 'c' not in cache and cache.get('c') == None
+        return {'msg': 'ttl_cache test passed', 'success': True}
+
+    def test_in_flight(self, n=8):
+        in_flight = InFlight()
+        calls = []
+        def fn():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'result'
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(in_flight.run('key', fn))) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1, f'{len(calls)} calls for {n} concurrent requests'
+        assert results == ['result'] * n, results
+        assert len(in_flight) == 0
+        return {'msg': 'in_flight test passed', 'success': True}
+
+    def test_batcher(self, n=16):
+        batches = []
+        def fn(items):
+            batches.append(list(items))
+            time.sleep(0.1)
+            return [item * 2 for item in items]
+        batcher = Batcher(fn, max_batch=64)
+        # a lone call goes straight through
+        assert batcher.run(1) == 2 and batches == [[1]]
+        results = {}
+        threads = [threading.Thread(target=lambda i=i: results.update({i: batcher.run(i)})) for i in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == {i: i * 2 for i in range(n)}, results
+        assert len(batches) < n + 1, f'{n} calls went out in {len(batches) - 1} batches'
+
+        # a failing or short fn fails every caller of the batch instead of leaving them waiting
+        for bad_fn in [lambda items: 1/0, lambda items: items[:-1]]:
+            batcher = Batcher(bad_fn)
+            errors = []
+            def run(i):
+                try:
+                    batcher.run(i)
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=5)
+            assert len(errors) == 4, errors
+        return {'msg': 'batcher test passed', 'success': True}
+
+    def test_weights_for_emit(self):
+        from commune.subspace.utils import convert_weights_and_uids_for_emit, U16_MAX
+        def old_convert(uids, weights):
+            # the pure python version that ran on the torch tensors tolist()
+            weights = [float(w) / sum(weights) for w in weights]
+            weight_uids, weight_vals = [], []
+            for weight_i, uid_i in zip(weights, uids):
+                uint16_val = int(float(weight_i) * int(U16_MAX))
+                if uint16_val != 0:
+                    weight_vals.append(uint16_val)
+                    weight_uids.append(uid_i)
+            return weight_uids, weight_vals
+
+        cases = [
+            ([0, 1, 2, 3], [0.1, 0.2, 0.3, 0.4]),
+            ([5, 9, 11], [1, 0, 3]),
+            ([0, 1, 2], [1e-9, 1.0, 2.0]),
+            (list(range(100)), [(i * 7919) % 101 for i in range(100)]),
+        ]
+        for uids, weights in cases:
+            new = convert_weights_and_uids_for_emit(uids, weights)
+            old = old_convert(uids, weights)
+            assert new == old, f'{new} != {old}'
+        assert convert_weights_and_uids_for_emit([0, 1], [0, 0]) == ([], [])
+        return {'msg': 'weights_for_emit test passed', 'success': True}
@@ -2,9 +2,7 @@ import numbers
 from typing import Callable, Union
 
 import commune as c
-import pandas
-import requests
-import torch
+import numpy as np
 from substrateinterface import Keypair
 from substrateinterface.utils import ss58
 from typing import List, Dict, Union, Optional, Tuple
@@ -58,19 +56,20 @@ def U64_NORMALIZED_FLOAT( x: int ) -> float:
 
 def indexed_values_to_dataframe ( 
         prefix: Union[str, int],
-        index: Union[list, torch.LongTensor], 
-        values: Union[list, torch.Tensor],
+        index: Union[list, 'np.ndarray', 'torch.LongTensor'], 
+        values: Union[list, 'np.ndarray', 'torch.Tensor'],
         filter_zeros: bool = False
     ) -> 'pandas.DataFrame':
+    import pandas
     # Type checking.
     if not isinstance(prefix, str) and not isinstance(prefix, numbers.Number):
         raise ValueError('Passed prefix must have type str or Number')
     if isinstance(prefix, numbers.Number):
         prefix = str(prefix)
-    if not isinstance(index, list) and not isinstance(index, torch.Tensor):
-        raise ValueError('Passed uids must have type list or torch.Tensor')
-    if not isinstance(values, list) and not isinstance(values, torch.Tensor):
-        raise ValueError('Passed values must have type list or torch.Tensor')
+    if not isinstance(index, list) and not hasattr(index, 'tolist'):
+        raise ValueError('Passed uids must have type list, np.ndarray or torch.Tensor')
+    if not isinstance(values, list) and not hasattr(values, 'tolist'):
+        raise ValueError('Passed values must have type list, np.ndarray or torch.Tensor')
     if not isinstance(index, list):
         index = index.tolist()
     if not isinstance(values, list):
@@ -99,6 +98,7 @@ def unbiased_topk( values, k, dim=0, sorted = True, largest = True):
             indices: (torch.LongTensor)
                 indices of the topk values.
     """
+    import torch
     permutation = torch.randperm(values.shape[ dim ])
     permuted_values = values[ permutation ]
     topk, indices = torch.topk( permuted_values,  k, dim = dim, sorted=sorted, largest=largest )
@@ -222,11 +222,11 @@ def strtobool_with_default( default: bool ) -> Callable[[str], bool]:
 # DEALINGS IN THE SOFTWARE.
 
 from typing import Tuple, List
-import torch
+# torch is imported inside the tensor helpers so that importing this module (and emitting weights) stays light
 
 
 
-def normalize_max_weight(  x: torch.FloatTensor, limit:float = 0.1 ) -> 'torch.FloatTensor':
+def normalize_max_weight(  x: 'torch.FloatTensor', limit:float = 0.1 ) -> 'torch.FloatTensor':
     r""" Normalizes the tensor x so that sum(x) = 1 and the max value is not greater than the limit.
         Args:
             x (:obj:`torch.FloatTensor`):
@@ -237,6 +237,7 @@ def normalize_max_weight(  x: torch.FloatTensor, limit:float = 0.1 ) -> 'torch.F
             y (:obj:`torch.FloatTensor`):
                 Normalized x tensor.
     """
+    import torch
     epsilon = 1e-7 #For numerical stability after normalization
     
     weights =  x.clone()
@@ -281,6 +282,7 @@ def convert_weight_uids_and_vals_to_tensor( n: int, uids: List[int], weights: Li
             row_weights ( torch.FloatTensor ):
                 Converted row weights.
     """
+    import torch
     row_weights = torch.zeros( [ n ], dtype=torch.float32 )
     for uid_j, wij in list(zip( uids, weights )):
         row_weights[ uid_j ] = float( wij ) / float(U16_MAX)
@@ -299,18 +301,19 @@ def convert_bond_uids_and_vals_to_tensor( n: int, uids: List[int], bonds: List[i
             row_bonds ( torch.FloatTensor ):
                 Converted row bonds.
     """
+    import torch
     row_bonds = torch.zeros( [ n ], dtype=torch.int64 )
     for uid_j, bij in list(zip( uids, bonds )):
         row_bonds[ uid_j ] = int( bij ) 
     return row_bonds
 
-def convert_weights_and_uids_for_emit( uids: torch.LongTensor, weights: torch.FloatTensor ) -> Tuple[List[int], List[int]]:
+def convert_weights_and_uids_for_emit( uids: Union[list, 'np.ndarray'], weights: Union[list, 'np.ndarray'] ) -> Tuple[List[int], List[int]]:
     r""" Converts weights into integer u32 representation that sum to MAX_INT_WEIGHT.
         Args:
-            uids (:obj:`torch.LongTensor,`):
-                Tensor of uids as destinations for passed weights.
-            weights (:obj:`torch.FloatTensor,`):
-                Tensor of weights.
+            uids (:obj:`np.ndarray,`):
+                Array (or list/tensor) of uids as destinations for passed weights.
+            weights (:obj:`np.ndarray,`):
+                Array (or list/tensor) of weights.
         Returns:
             weight_uids (List[int]):
                 Uids as a list.
@@ -318,27 +321,19 @@ def convert_weights_and_uids_for_emit( uids: torch.LongTensor, weights: torch.Fl
                 Weights as a list.
     """
     # Checks.
-    weights = weights.tolist()
-    uids = uids.tolist()
-    if min(weights) < 0:
-        raise ValueError('Passed weight is negative cannot exist on chain {}'.format(weights))
-    if min(uids) < 0:
-        raise ValueError('Passed uid is negative cannot exist on chain {}'.format(uids))
+    weights = np.asarray(weights, dtype=np.float64)
+    uids = np.asarray(uids, dtype=np.int64)
+    if weights.min() < 0:
+        raise ValueError('Passed weight is negative cannot exist on chain {}'.format(weights.tolist()))
+    if uids.min() < 0:
+        raise ValueError('Passed uid is negative cannot exist on chain {}'.format(uids.tolist()))
     if len(uids) != len(weights):
         raise ValueError('Passed weights and uids must have the same length, got {} and {}'.format(len(uids), len(weights)))
-    if sum(weights) == 0:
+    weights_sum = weights.sum()
+    if weights_sum == 0:
         return [],[] # Nothing to set on chain.
-    else:
-        weights = [ float(value) / sum(weights) for value in weights] # Initial normalization.
-
-    weight_vals = []
-    weight_uids = []
-    for i, (weight_i, uid_i) in enumerate(list(zip(weights, uids))):
-        uint16_val = int(float(weight_i) * int(U16_MAX))  # convert to int representation.
-
-        # Filter zeros
-        if uint16_val != 0: # Filter zeros
-            weight_vals.append( uint16_val )
-            weight_uids.append( uid_i ) 
+    weights = weights / weights_sum # Initial normalization.
 
-    return weight_uids, weight_vals
\ No newline at end of file
+    uint16_vals = (weights * U16_MAX).astype(np.int64) # convert to int representation.
+    nonzero = uint16_vals != 0 # Filter zeros
+    return uids[nonzero].tolist(), uint16_vals[nonzero].tolist()
\ No newline at end of file
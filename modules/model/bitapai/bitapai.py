@@ -1,22 +1,159 @@
-import http.client
-import json
+import asyncio
+import importlib.util
+import threading
+from collections import OrderedDict
 import commune as c
 import base64
 
 from PIL import Image
 from io import BytesIO
 
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    import json
+    json_dumps = lambda obj: json.dumps(obj).encode('utf-8')
+    json_loads = json.loads
 
 
 class BitAPAI(c.Module):
     
-    whitelist = ['forward', 'chat', 'ask', 'generate', 'imagine']
+    whitelist = ['forward', 'forward_batch', 'chat', 'ask', 'generate', 'imagine']
+    # (prompt, ...) -> (timestamp, response), shared across instances
+    response_cache = OrderedDict()
+    response_cache_lock = threading.Lock()
 
-    def __init__(self, api_key:str = None, host='api.bitapai.io', cache_key:bool = True):
+    def __init__(self, 
+                 api_key:str = None, 
+                 host='api.bitapai.io', 
+                 cache_key:bool = True, 
+                 timeout:int = 30,
+                 max_connections:int = 100,
+                 max_keepalive_connections:int = 20,
+                 http2:bool = True,
+                 cache_ttl:int = 30,
+                 cache_size:int = 1024,
+                 loop: 'asyncio.EventLoop' = None):
         config = self.set_config(kwargs=locals())
-        self.conn = http.client.HTTPSConnection(self.config.host)
+        # the sync calls run on one long-lived loop (and its pooled client) in a background thread
+        if loop == None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+        self.loop = loop
+        self.set_client(host=config.host, 
+                        timeout=config.timeout, 
+                        max_connections=config.max_connections, 
+                        max_keepalive_connections=config.max_keepalive_connections,
+                        http2=config.http2)
         self.set_api_key(api_key=config.api_key, cache=config.cache_key)
+
+    def set_client(self, 
+                   host:str = 'api.bitapai.io', 
+                   timeout:int = 30, 
+                   max_connections:int = 100, 
+                   max_keepalive_connections:int = 20, 
+                   http2:bool = True):
+        # an AsyncClient belongs to the loop it runs on, so the clients are made per loop (see get_client)
+        self.client_kwargs = dict(host=host, 
+                                  timeout=timeout, 
+                                  max_connections=max_connections, 
+                                  max_keepalive_connections=max_keepalive_connections, 
+                                  http2=http2)
+        self.loop2client = {}
+        self.client_lock = threading.Lock()
+        return self.client_kwargs
+
+    def new_client(self, 
+                   host:str = 'api.bitapai.io', 
+                   timeout:int = 30, 
+                   max_connections:int = 100, 
+                   max_keepalive_connections:int = 20, 
+                   http2:bool = True) -> 'httpx.AsyncClient':
+        import httpx
+        # http2 needs the optional h2 package, fall back to http1.1 keep-alive without it
+        http2 = http2 and importlib.util.find_spec('h2') is not None
+        return httpx.AsyncClient(base_url=f'https://{host}', 
+                                 http2=http2,
+                                 limits=httpx.Limits(max_connections=max_connections, 
+                                                     max_keepalive_connections=max_keepalive_connections),
+                                 timeout=timeout,
+                                 headers={'Content-Type': 'application/json'})
+
+    def get_client(self) -> 'httpx.AsyncClient':
+        # the pooled client of the running loop
+        loop = asyncio.get_running_loop()
+        with self.client_lock:
+            if loop not in self.loop2client:
+                # the clients of closed loops cant be used or closed anymore
+                self.loop2client = {l: client for l, client in self.loop2client.items() if not l.is_closed()}
+                self.loop2client[loop] = self.new_client(**self.client_kwargs)
+            return self.loop2client[loop]
+
+    def run_async(self, coro):
+        """
+        Runs coro on self.loop and waits for its result, from any thread. 
+        Async code should await the async_* methods instead.
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop == self.loop:
+            coro.close()
+            raise RuntimeError('Blocking on the loop that has to run the request would deadlock, await the async_* method instead')
+        if not self.loop.is_running():
+            # a loop that was passed in but is not running yet
+            return self.loop.run_until_complete(coro)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def async_request(self, path:str, payload:dict, api_key:str = None) -> dict:
+        api_key = api_key if api_key != None else self.api_key
+        response = await self.get_client().post(path, content=json_dumps(payload), headers={'X-API-KEY': api_key})
+        # parse the raw bytes, no utf-8 decode pass
+        return json_loads(response.content)
+
+    def request(self, path:str, payload:dict, api_key:str = None) -> dict:
+        return self.run_async(self.async_request(path, payload, api_key=api_key))
+
+    async def async_close(self):
+        with self.client_lock:
+            client = self.loop2client.pop(asyncio.get_running_loop(), None)
+        if client != None:
+            await client.aclose()
+
+    def close(self):
+        return self.run_async(self.async_close())
         
+    def get_cached_response(self, key:tuple):
+        if self.config.cache_ttl <= 0:
+            return None
+        with self.response_cache_lock:
+            item = self.response_cache.get(key)
+            if item == None:
+                return None
+            timestamp, response = item
+            if c.time() - timestamp > self.config.cache_ttl:
+                self.response_cache.pop(key, None)
+                return None
+            self.response_cache.move_to_end(key)
+            return response
+
+    def put_cached_response(self, key:tuple, response:str):
+        if self.config.cache_ttl <= 0 or response == None:
+            return
+        with self.response_cache_lock:
+            self.response_cache[key] = (c.time(), response)
+            self.response_cache.move_to_end(key)
+            while len(self.response_cache) > self.config.cache_size:
+                self.response_cache.popitem(last=False)
+
+    @classmethod
+    def clear_cache(cls):
+        with cls.response_cache_lock:
+            cls.response_cache.clear()
+
     def set_api_key(self, api_key:str, cache:bool = True):
         if api_key == None:
             api_key = self.get_api_key()
@@ -29,7 +166,7 @@ class BitAPAI(c.Module):
 
             
     
-    def forward(self, 
+    async def async_forward(self, 
                 prompt:str,
                 count:int = 20,
                 return_all:bool = False,
@@ -37,20 +174,25 @@ class BitAPAI(c.Module):
                 uids: list = None,
                 api_key:str = None, 
                 history:list=None) -> str: 
-        api_key = api_key if api_key != None else self.api_key
+        if history and not isinstance(history, list):
+            raise TypeError(f'history must be a list of messages, got {type(history)}')
+
+        # routing to specific uids is not deterministic, so we dont cache it
+        cache_key = None
+        if uids is None:
+            history_key = tuple((m.get('role'), m.get('content')) for m in history or ())
+            cache_key = (prompt, count, return_all, exclude_unavailable, history_key)
+            response = self.get_cached_response(cache_key)
+            if response != None:
+                return response
         
-        # build payload
+        # build payload, the history goes between the system and the user message
+        messages = [{"role": "system", "content": "You are an AI assistant"}]
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": prompt})
         payload =  {
-            'messages': [
-                {
-                    "role": "system",
-                    "content": "You are an AI assistant"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            'messages': messages,
             "count": count,
             "return_all": return_all,
             "exclude_unavailable": exclude_unavailable
@@ -59,38 +201,53 @@ class BitAPAI(c.Module):
         if uids is not None:
             payload['uids'] = uids
 
-        if history is not None:
-            assert isinstance(history, list)
-            assert len(history) > 0
-            assert all([isinstance(i, dict) for i in history])
-            payload = payload[:1] +  history + payload[1:]
-
 
         # make API call to BitAPAI
-        payload = json.dumps(payload)
-        headers = {
-            'Content-Type': 'application/json',
-            'X-API-KEY': api_key
-        }        
-        self.conn.request("POST", "/text", payload, headers)
-
-
-        # fetch responses
-        res = self.conn.getresponse()
-        data = res.read().decode("utf-8")
-        data = json.loads(data)
+        data = await self.async_request("/text", payload, api_key=api_key)
 
         # find non-empty responses in data['choices']
+        response = None
         for i in range(len(data['choices'])):
             if len(data['choices'][i]['message']) > 0 and \
                data['choices'][i]['message']['content'] != '':
-                return data['choices'][i]['message']['content']
+                response = data['choices'][i]['message']['content']
+                break
 
-        return None
+        if cache_key != None:
+            self.put_cached_response(cache_key, response)
+
+        return response
+
+    def forward(self, 
+                prompt:str,
+                count:int = 20,
+                return_all:bool = False,
+                exclude_unavailable:bool = True,
+                uids: list = None,
+                api_key:str = None, 
+                history:list=None) -> str: 
+        return self.run_async(self.async_forward(prompt=prompt, 
+                                                 count=count, 
+                                                 return_all=return_all, 
+                                                 exclude_unavailable=exclude_unavailable, 
+                                                 uids=uids, 
+                                                 api_key=api_key, 
+                                                 history=history))
     
     chat = ask = forward
 
-    def imagine( self, 
+    async def async_forward_batch(self, prompts:list, concurrency:int = 20, **kwargs) -> list:
+        # overlap the round trips over the keep-alive pool, bounded by concurrency
+        semaphore = asyncio.Semaphore(concurrency)
+        async def forward_one(prompt):
+            async with semaphore:
+                return await self.async_forward(prompt, **kwargs)
+        return await asyncio.gather(*[forward_one(prompt) for prompt in prompts])
+
+    def forward_batch(self, prompts:list, concurrency:int = 20, **kwargs) -> list:
+        return self.run_async(self.async_forward_batch(prompts, concurrency=concurrency, **kwargs))
+
+    async def async_imagine( self, 
                 prompt: str,
                 negative_prompt: str = '',
                 width: int = 1024,
@@ -101,7 +258,6 @@ class BitAPAI(c.Module):
                 uids: list = None,
                 api_key: str = None, 
                 history: list=None) -> str: 
-        api_key = api_key if api_key != None else self.api_key
         
         # build payload
         payload =  {
@@ -116,26 +272,9 @@ class BitAPAI(c.Module):
         if uids is not None:
             payload['uids'] = uids
 
-        if history is not None:
-            assert isinstance(history, list)
-            assert len(history) > 0
-            assert all([isinstance(i, dict) for i in history])
-            payload = payload[:1] +  history + payload[1:]
-
 
         # make API call to BitAPAI
-        payload = json.dumps(payload)
-        headers = {
-            'Content-Type': 'application/json',
-            'X-API-KEY': api_key
-        }
-        self.conn.request("POST", "/image", payload, headers)
-
-
-        # fetch responses
-        res = self.conn.getresponse()
-        data = res.read().decode("utf-8")
-        data = json.loads(data)
+        data = await self.async_request("/image", payload, api_key=api_key)
         
         assert len(data['choices']) > 0
         
@@ -169,3 +308,5 @@ class BitAPAI(c.Module):
 
         return None
 
+    def imagine(self, prompt:str, **kwargs) -> str:
+        return self.run_async(self.async_imagine(prompt, **kwargs))
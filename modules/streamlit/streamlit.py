@@ -2,6 +2,7 @@
 
 import os
 import sys
+import functools
 import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
@@ -10,6 +11,18 @@ import plotly.express as px
 
 import commune as c
 
+# the plotly express functions, resolved once at import instead of on every rerun
+PX_FUNCTIONS = {fn_name: getattr(px, fn_name) for fn_name in dir(px) 
+                if not (fn_name.startswith('__') and fn_name.endswith('__')) and callable(getattr(px, fn_name))}
+
+@st.cache_data(show_spinner=False)
+def cached_schema(module_name:str) -> dict:
+    # streamlit reruns the script on every widget change, so dont reflect over the module each time
+    return c.module(module_name).schema(defaults=True, include_parents=True)
+
+@st.cache_data(show_spinner=False)
+def cached_config(module_name:str) -> dict:
+    return c.module(module_name).config(to_munch=False)
 
 
 class StreamlitModule(c.Module):
@@ -17,10 +30,16 @@ class StreamlitModule(c.Module):
     height:int=1000
     width:int=1000
     theme: str= 'plotly_dark' 
+    px_functions = PX_FUNCTIONS
+    # (class, prefix) -> function names, these dont change after the class is defined
+    fn_cache = {}
 
     @property
     def streamlit_functions(self):
-        return [fn for fn in dir(self) if fn.startswith('st_')]  
+        key = (type(self), 'st_')
+        if key not in self.fn_cache:
+            self.fn_cache[key] = [fn for fn in dir(self) if fn.startswith('st_')]
+        return self.fn_cache[key]
     
 
     def run(self, data, plots=[], default_plot  ='histogram', title=None ):
@@ -63,8 +82,11 @@ class StreamlitModule(c.Module):
             row_cols[row_idx][col_idx].metric(k, int(v))
 
     def plot_options(self, prefix:str ='st_plot'):
-        plot_options = self.fns(prefix)
-        return [p.replace(prefix+'_', '')for p in plot_options]
+        key = (type(self), prefix)
+        if key not in self.fn_cache:
+            plot_options = self.fns(prefix)
+            self.fn_cache[key] = [p.replace(prefix+'_', '')for p in plot_options]
+        return self.fn_cache[key]
 
 
     def show(self, fig):
@@ -73,7 +95,7 @@ class StreamlitModule(c.Module):
 
     def st_plot_scatter2D(self, df=None):
         df = df if isinstance(df, pd.DataFrame) else self.df
-        column_options = list(df.columns)
+        column_options = df.columns
 
 
         with self.cols[0]:
@@ -84,14 +106,13 @@ class StreamlitModule(c.Module):
             y_col = st.selectbox("Y Axis", column_options, 1)
 
             st.markdown("## Color Axis")
-            color_col = st.selectbox("Color",  column_options + [None],  0)
-            color_args = {"color": color_col} if color_col is not None else {}
+            color_col = st.selectbox("Color",  [*column_options, None],  0)
             marker_size = st.slider("Select Marker Size", 5, 30, 20)
 
-            df["size"] = [marker_size for _ in range(len(df))]
+            df["size"] = marker_size
 
         
-        fig = px.scatter(df, x=x_col, y=y_col, size="size", **color_args)
+        fig = px.scatter(df, x=x_col, y=y_col, size="size", color=color_col)
         fig.update_layout(width=1000,
                         height=800)
 
@@ -102,7 +123,8 @@ class StreamlitModule(c.Module):
 
     def st_plot_scatter3D(self, df=None):
         df = df if isinstance(df, pd.DataFrame) else self.df
-        column_options = list(df.columns)
+        column_options = df.columns
+        none_plus_cols = [None, *column_options]
 
         plotly_kwargs = {}
         with self.cols[0]:
@@ -113,9 +135,9 @@ class StreamlitModule(c.Module):
             st.markdown("## Z Axis")
             plotly_kwargs['z'] = st.selectbox("Z Axis", column_options, 2)
             st.markdown("## Color Axis")
-            plotly_kwargs['color'] = st.selectbox("## Color", [None] + column_options, 0)
+            plotly_kwargs['color'] = st.selectbox("## Color", none_plus_cols, 0)
             marker_size = st.slider("Select Marker Size", 5, 30, 20)
-            df["size"] = [marker_size for _ in range(len(df))]
+            df["size"] = marker_size
             plotly_kwargs['size']= 'size'
             plotly_kwargs['template'] = self.theme
 
@@ -128,7 +150,8 @@ class StreamlitModule(c.Module):
 
 
         df = df if isinstance(df, pd.DataFrame) else self.df
-        column_options = list(df.columns)
+        column_options = df.columns
+        none_plus_cols = [None, *column_options]
         plotly_kwargs = {}
         
         with self.cols[0]:
@@ -137,9 +160,9 @@ class StreamlitModule(c.Module):
             st.markdown("## Y Axis")
             plotly_kwargs['y'] = st.selectbox("Y Axis", column_options, 1)
             st.markdown("## Color Axis")
-            plotly_kwargs['color'] = st.selectbox("Color", [None] + column_options, 0)
+            plotly_kwargs['color'] = st.selectbox("Color", none_plus_cols, 0)
             marker_size = st.slider("Select Marker Size", 5, 30, 20)
-            df["size"] = [marker_size for _ in range(len(df))]
+            df["size"] = marker_size
             plotly_kwargs['template'] = self.theme
             st.markdown("## Box Group Mode")
             plotly_kwargs['boxmode'] = st.selectbox("Choose Box Mode", ["group", "overlay"], 0)
@@ -154,7 +177,8 @@ class StreamlitModule(c.Module):
     def st_plot_bar(self, df=None):
 
         df = df if isinstance(df, pd.DataFrame) else self.df
-        column_options = list(df.columns)
+        column_options = df.columns
+        none_plus_cols = [None, *column_options]
 
 
         plot_kwargs = {}
@@ -169,7 +193,7 @@ class StreamlitModule(c.Module):
             plot_kwargs['barmode'] = st.selectbox("Choose Bar Mode", ["relative", "group", "overlay"], 1)
 
             st.markdown("## Color Axis")
-            plot_kwargs['color'] = st.selectbox("Color",  [None] + column_options, 0 )
+            plot_kwargs['color'] = st.selectbox("Color",  none_plus_cols, 0 )
 
         fig = px.bar(df, **plot_kwargs)
 
@@ -182,7 +206,8 @@ class StreamlitModule(c.Module):
     def st_plot_histogram(self, df=None):
 
         df = df if isinstance(df, pd.DataFrame) else self.df
-        column_options = list(df.columns)
+        column_options = df.columns
+        none_plus_cols = [None, *column_options]
         # Choose X, Y and Color Axis
         with self.cols[0]:
             plot_kwargs = {}
@@ -191,10 +216,10 @@ class StreamlitModule(c.Module):
             # plot_kwargs['nbins'] = st.slider("Number of Bins", 10, 1000, 10)
 
             st.markdown("### Y-axis")
-            plot_kwargs['y'] = st.selectbox("Choose Y-Axis Feature", [None]+ column_options, 0)
+            plot_kwargs['y'] = st.selectbox("Choose Y-Axis Feature", none_plus_cols, 0)
 
             st.markdown("## Color Axis")
-            plot_kwargs['color'] = st.selectbox("Color",  [None]+ column_options , 0 )
+            plot_kwargs['color'] = st.selectbox("Color",  none_plus_cols , 0 )
             # color_args = {"color":color_col} if color_col is not None else {}
             
             plot_kwargs['barmode'] = st.selectbox("Choose Bar Mode", ["relative", "group", "overlay"], 2)
@@ -206,29 +231,30 @@ class StreamlitModule(c.Module):
         return fig
 
 
-    def st_plot_heatmap(cls, df=None):
+    def st_plot_heatmap(self, df=None):
 
         df = df if isinstance(df, pd.DataFrame) else self.df
-        column_options = list(df.columns)
+        column_options = df.columns
+        none_plus_cols = [None, *column_options]
         # Choose X, Y and Color Axis
 
         plotly_kwargs = {}
-        with cls.cols[0]:
+        with self.cols[0]:
             st.markdown("### X-axis")
             plotly_kwargs['x'] = st.selectbox("Choose X-Axis Feature", column_options, 0)
             plotly_kwargs['nbinsx'] = st.slider("Number of Bins", 10, 100, 10)
 
             st.markdown("### Y-axis")
-            plotly_kwargs['y'] = st.selectbox("Choose Y-Axis Feature", [None]+column_options, 0)
+            plotly_kwargs['y'] = st.selectbox("Choose Y-Axis Feature", none_plus_cols, 0)
             plotly_kwargs['nbinsy'] = st.slider("Number of Bins (Y-Axis)", 10, 100, 10)
 
             st.markdown("### Z-axis")
             plotly_kwargs['z'] = st.selectbox("Choose Z-Axis Feature", column_options, 0)
             plotly_kwargs['histfunc'] = st.selectbox("Aggregation Function", ["avg", "sum", "min", "sum", "count"], 0)
-            plotly_kwargs['template'] = cls.theme
+            plotly_kwargs['template'] = self.theme
 
         fig = px.density_heatmap(df, **plotly_kwargs)
-        fig.update_layout(width=cls.width, height=cls.height, font_size=20)
+        fig.update_layout(width=self.width, height=self.height, font_size=20)
 
 
 
@@ -240,17 +266,28 @@ class StreamlitModule(c.Module):
     @classmethod
     def style2path(cls, style:str=None) -> str:
         path = cls.dirpath() + '/styles'
-        style2path = {p.split('/')[-1].split('.')[0] : p for p in cls.ls(path)}
+        # the directory mtime changes when a style is added or removed
+        style2path = cls._style2path(path, os.stat(path).st_mtime)
         if style != None:
             return style2path[style]
-        return style2path
-        
+        return dict(style2path)
+
+    @classmethod
+    @functools.lru_cache(maxsize=4)
+    def _style2path(cls, path:str, mtime:float) -> dict:
+        return {p.split('/')[-1].split('.')[0] : p for p in cls.ls(path)}
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def _read_style(style_path:str, mtime:float) -> str:
+        with open(style_path) as f:
+            return f"<style>{f.read()}</style>"
         
     @classmethod
     def load_style(cls, style='commune'):
         style_path =  cls.style2path(style)        
-        with open(style_path) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        # streamlit needs the style on every rerun, but we only read the file when it changes
+        st.markdown(cls._read_style(style_path, os.stat(style_path).st_mtime), unsafe_allow_html=True)
         css = r'''
             <style>
                 [data-testid="stForm"] {border: 0px}
@@ -263,68 +300,6 @@ class StreamlitModule(c.Module):
     def line_seperator(cls, text='-', length=50):
         st.write(text*length)
       
-    @classmethod
-    def function2streamlit(cls, 
-                           module = None,
-                           fn:str = '__init__',
-                           fn_schema = None, 
-                           extra_defaults:dict=None,
-                           cols:list=None,
-                           skip_keys = ['self', 'cls'],
-                            mode = 'pm2'):
-        
-        key_prefix = f'{module}.{c.random_word()}'
-        if module == None:
-            module = cls
-            
-        elif isinstance(module, str):
-            module = c.module(module)
-        extra_defaults = {} if extra_defaults is None else extra_defaults
-        
-        if fn_schema == None:
-
-            fn_schema = module.schema(defaults=True, include_parents=True)[fn]
-            if fn == '__init__':
-                config = module.config(to_munch=False)
-                extra_defaults = config
-            kwargs = {}
-            fn_schema['default'].pop('self', None)
-            fn_schema['default'].pop('cls', None)
-            fn_schema['default'].update(extra_defaults)
-            fn_schema['default'].pop('config', None)
-            fn_schema['default'].pop('kwargs', None)
-            
-        fn_schema['input'].update({k:str(type(v)).split("'")[1] for k,v in extra_defaults.items()})
-        if cols == None:
-            cols = [1 for i in list(range(int(len(fn_schema['input'])**0.5)))]
-        cols = st.columns(cols)
-
-        for i, (k,v) in enumerate(fn_schema['default'].items()):
-            
-            optional = fn_schema['default'][k] != 'NA'
-            fn_key = k 
-            if fn_key in skip_keys:
-                continue
-            if k in fn_schema['input']:
-                k_type = fn_schema['input'][k]
-                if 'Munch' in k_type or 'Dict' in k_type:
-                    k_type = 'Dict'
-                if k_type.startswith('typing'):
-                    k_type = k_type.split('.')[-1]
-                fn_key = f'**{k} ({k_type}){"" if optional else "(REQUIRED)"}**'
-            col_idx  = i 
-            if k in ['kwargs', 'args'] and v == 'NA':
-                continue
-            
-
-            random_word = c.random_word()
-            col_idx = col_idx % (len(cols))
-            kwargs[k] = cols[col_idx].text_input(fn_key, v, key=f'{key_prefix}.{k}.{random_word}')
-     
-        kwargs = cls.process_kwargs(kwargs, fn_schema)       
-        
-        return kwargs
-
    
     @classmethod
     def process_kwargs(cls, kwargs:dict, fn_schema:dict):
@@ -385,11 +360,7 @@ class StreamlitModule(c.Module):
     
     def add_plot_tools(self):
         # sync plots from express
-        for fn_name in dir(px):
-            if not (fn_name.startswith('__') and fn_name.endswith('__')):
-                plt_obj = getattr(px, fn_name)
-                if callable(plt_obj):
-                    setattr(self, fn_name, plt_obj)
+        self.__dict__.update(self.px_functions)
 
         # self.dag = DagModule()
 
@@ -571,6 +542,12 @@ class StreamlitModule(c.Module):
             st.plotly_chart(fig)
         # st.write(kwargs)
             
+    @classmethod
+    def clear_schema_cache(cls):
+        # call this after reloading module code
+        cached_schema.clear()
+        cached_config.clear()
+
     @classmethod
     def stwrite(self, *args, **kwargs):
         import streamlit as st
@@ -593,6 +570,7 @@ class StreamlitModule(c.Module):
         key_prefix = f'{module}.{fn}'
         if salt != None:
             key_prefix = f'{key_prefix}.{salt}'
+        module_name = module if isinstance(module, str) else None
         if module == None:
             module = cls
             
@@ -603,18 +581,18 @@ class StreamlitModule(c.Module):
 
         if fn_schema == None:
 
-            fn_schema = module.schema(defaults=True, include_parents=True)[fn]
+            if module_name != None:
+                fn_schema = cached_schema(module_name)[fn]
+            else:
+                fn_schema = module.schema(defaults=True, include_parents=True)[fn]
             if fn == '__init__':
-                config = module.config(to_munch=False)
+                config = cached_config(module_name) if module_name != None else module.config(to_munch=False)
                 extra_defaults = config
             st.write(fn_schema)
-            fn_schema['default'].pop('self', None)
-            fn_schema['default'].pop('cls', None)
-            fn_schema['default'].update(extra_defaults)
-            fn_schema['default'].pop('config', None)
-            fn_schema['default'].pop('kwargs', None)
+            fn_schema['default'] = {k:v for k,v in {**fn_schema['default'], **extra_defaults}.items() 
+                                    if k not in ('self', 'cls', 'config', 'kwargs')}
             
-        fn_schema['input'].update({k:str(type(v)).split("'")[1] for k,v in extra_defaults.items()})
+        fn_schema['input'].update({k:type(v).__name__ for k,v in extra_defaults.items()})
         if cols == None:
             cols = [1 for i in list(range(int(len(fn_schema['input'])**0.5)))]
         if len(cols) == 0:
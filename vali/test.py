@@ -0,0 +1,43 @@
+import os
+import tempfile
+import commune as c
+from vali.vali import ModuleStore
+
+class Test(c.Module):
+
+    def test_module_store(self):
+        path = os.path.join(tempfile.mkdtemp(), 'module_infos.db')
+        store = ModuleStore(path, flush_interval=1000)
+        info = {'name': 'model.a', 'address': '0.0.0.0:8000', 'w': 0.5}
+        store.put('model.a', info)
+        # pending writes are visible before the flush
+        assert store.get('model.a') == info
+        assert store.flush() == 1
+        assert store.flush() == 0
+
+        # a new connection reads back what was flushed
+        store = ModuleStore(path, flush_interval=1000)
+        assert store.get('model.a') == info, store.get('model.a')
+        assert store.names() == ['model.a']
+        assert [(name, r) for name, _, r in store.items()] == [('model.a', info)]
+
+        store.rm(['model.a'])
+        assert store.get('model.a') == None and store.names() == []
+        return {'msg': 'module_store test passed', 'success': True}
+
+    def test_put_if_changed(self):
+        path = os.path.join(tempfile.mkdtemp(), 'module_infos.db')
+        store = ModuleStore(path, flush_interval=1000)
+        info = {'name': 'model.a', 'w': 0.5}
+        assert store.put_if_changed('model.a', info, (0.5, 0, 1))
+        assert not store.put_if_changed('model.a', info, (0.5, 0, 1)), 'same write key should skip the write'
+        assert store.put_if_changed('model.a', {**info, 'w': 0.6}, (0.6, 0, 1))
+        store.flush()
+        assert store.get('model.a')['w'] == 0.6
+
+        # a removed row is written again even with the same write key
+        store.rm(['model.a'])
+        assert store.put_if_changed('model.a', info, (0.6, 0, 1))
+        store.flush()
+        assert store.get('model.a') == info
+        return {'msg': 'put_if_changed test passed', 'success': True}
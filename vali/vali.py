@@ -1,10 +1,125 @@
 
+import os
+import json
+import time
+import random
+import heapq
+import operator
+import sqlite3
+import asyncio
+import threading
 import commune as c
 from typing import *
+from commune.subspace.rpc_cache import TTLCache
+
+
+class ModuleStore:
+    """
+    The module infos of a validator in one sqlite file (WAL) keyed by module name,
+    instead of a json file per module that has to be listed and opened one by one.
+    Writes are buffered in memory and flushed in one transaction every flush_interval seconds.
+    """
+
+    def __init__(self, path:str, flush_interval:float = 2):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        # name -> (timestamp, info) waiting for the next flush
+        self.pending = {}
+        # name -> write key of the last info put, see put_if_changed
+        self.name2write_key = {}
+        # autocommit, the workers write from many threads through one connection
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS module_infos (name TEXT PRIMARY KEY, timestamp REAL, data TEXT)')
+        self.flush_interval = flush_interval
+        threading.Thread(target=self.flush_loop, daemon=True).start()
+
+    def get(self, name:str, default=None):
+        with self.lock:
+            if name in self.pending:
+                return dict(self.pending[name][1])
+            row = self.conn.execute('SELECT data FROM module_infos WHERE name = ?', (name,)).fetchone()
+        return default if row == None else json.loads(row[0])
+
+    def put(self, name:str, info:dict):
+        # memory only, the disk write happens in the next flush
+        with self.lock:
+            self.pending[name] = (c.time(), info)
+            self.name2write_key.pop(name, None)
+        return info
+
+    def put_if_changed(self, name:str, info:dict, write_key) -> bool:
+        # skips the put when write_key matches the one of the last info put under name
+        with self.lock:
+            if self.name2write_key.get(name) == write_key:
+                return False
+            self.name2write_key[name] = write_key
+            self.pending[name] = (c.time(), info)
+        return True
+
+    def flush(self) -> int:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if len(pending) == 0:
+                return 0
+            rows = []
+            for name, (timestamp, info) in pending.items():
+                try:
+                    rows.append((name, timestamp, json.dumps(info)))
+                except Exception as e:
+                    # an info that cant be serialized would fail every flush, drop it
+                    c.print(f'Dropping the info of {name}, it is not json ({e})', color='red')
+            try:
+                self.conn.execute('BEGIN')
+                self.conn.executemany('INSERT OR REPLACE INTO module_infos VALUES (?, ?, ?)', rows)
+                self.conn.execute('COMMIT')
+            except Exception as e:
+                # leave no transaction open (the next BEGIN would fail) and keep the rows for the next flush,
+                # unless a newer info was put under the same name in the meantime
+                if self.conn.in_transaction:
+                    self.conn.execute('ROLLBACK')
+                for name, item in pending.items():
+                    self.pending.setdefault(name, item)
+                raise e
+        return len(rows)
+
+    def flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                c.print(f'Failed to flush {self.path} ({e})', color='red')
+
+    def items(self) -> List[tuple]:
+        """
+        [(name, timestamp, info)] of every module in one read
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT name, timestamp, data FROM module_infos').fetchall()
+            pending = dict(self.pending)
+        items = [(name, timestamp, json.loads(data)) for name, timestamp, data in rows if name not in pending]
+        return items + [(name, timestamp, dict(info)) for name, (timestamp, info) in pending.items()]
+
+    def names(self) -> List[str]:
+        with self.lock:
+            names = [row[0] for row in self.conn.execute('SELECT name FROM module_infos')]
+            stored = set(names)
+            return names + [name for name in self.pending if name not in stored]
+
+    def rm(self, names:List[str]):
+        with self.lock:
+            for name in names:
+                self.pending.pop(name, None)
+                self.name2write_key.pop(name, None)
+            self.conn.executemany('DELETE FROM module_infos WHERE name = ?', [(name,) for name in names])
+
 
 class Vali(c.Module):
 
     last_sync_time = 0
+    last_sync_block = None
     last_sent = 0
     last_success = 0
     errors = 0
@@ -13,6 +128,14 @@ class Vali(c.Module):
     score_fns = ['score_module', 'score']
     whitelist = ['eval_module', 'score_module', 'eval', 'leaderboard']
     address2last_update = {}
+    # address -> last time prefetch tried it
+    address2last_prefetch = {}
+    source_namespace = (None, None)
+    # network -> subspace client shared by the validator and its workers
+    subspaces = {}
+    namespace_address2name = (None, {})
+    # (fn, network, netuid, block, args) -> chain reads, head reads live for a block, reads at a block forever
+    rpc_cache = TTLCache(maxsize=256)
 
 
 
@@ -32,16 +155,17 @@ class Vali(c.Module):
         # merge the config with the default config
             
         config = self.set_config(config, kwargs=kwargs)
-
-        c.print(config, 'VALI CONFIG')
-
         config = c.dict2munch({**Vali.get_config(), **config})
+        if config.verbose or config.debug:
+            c.print(config, 'VALI CONFIG')
 
         if hasattr(config, 'key'):
             self.key = c.key(config.key)
         self.config = config
         self.sync()
         c.thread(self.run_loop)
+        if self.config.prefetch:
+            c.thread(self.prefetch_loop)
 
     init = init_vali
 
@@ -55,9 +179,15 @@ class Vali(c.Module):
         self.start_time = c.time()
         for i in range(self.config.workers):
             self.start_worker(i)
+        fail_streak = 0
         while True:
-
-            c.sleep(self.config.sleep_interval)
+            # double the sleep per failure in a row (jittered so validators dont retry in lockstep), 
+            # after max_loop_failures the breaker opens and only half-opens every loop_breaker_interval
+            if fail_streak >= self.config.max_loop_failures:
+                sleep = self.config.loop_breaker_interval
+            else:
+                sleep = min(self.config.sleep_interval * 2**fail_streak, self.config.max_loop_sleep)
+            c.sleep(sleep + random.uniform(0, self.config.sleep_interval) * (fail_streak > 0))
             try:
                 self.sync()
                 run_info = self.run_info()
@@ -69,14 +199,19 @@ class Vali(c.Module):
                 else:
                     if self.vote_staleness > self.config.vote_interval:
                         r = self.vote()
+                if 'error' in r:
+                    raise Exception(r['error'])
                 run_info.update(r)
+                fail_streak = 0
 
                 df = self.leaderboard()[:10]
                 c.print(df)
                 c.print(run_info)
 
             except Exception as e:
+                fail_streak += 1
                 c.print(c.detailed_error(e))
+                c.print(f'Loop failed {fail_streak} times in a row', color='red')
 
 
 
@@ -134,54 +269,112 @@ class Vali(c.Module):
 
 
     def epoch(self, batch_size = None, network=None, **kwargs):
+        # the evals are driven from one event loop, the blocking score_module calls run on the thread pool
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.async_epoch(batch_size=batch_size, network=network, **kwargs))
+        finally:
+            loop.close()
+
+    async def async_epoch(self, batch_size = None, network=None, **kwargs):
         self.sync(network=network)
-        futures = []
+        now = c.time()
+        # draw up to epoch_size of the modules that are due instead of shuffling the whole namespace
+        due_addresses = [a for a in self.namespace.values() if now - self.address2last_update.get(a, 0) >= self.config.min_update_interval]
+        module_addresses = random.sample(due_addresses, k=min(len(due_addresses), self.config.epoch_size or len(due_addresses)))
+        # the pool is sized by the config and kept across epochs, batch_size only caps the evals in flight
+        batch_size = batch_size or self.config.batch_size
+        if not hasattr(self, 'executor') or self.executor.max_workers != self.config.batch_size:
+            if hasattr(self, 'executor'):
+                self.executor.shutdown(wait=False)
+            self.executor = c.module('executor.thread')(max_workers=self.config.batch_size)
+
+        async def eval_module(module_address):
+            future = self.executor.submit(self.eval, args=[module_address], timeout=self.config.timeout)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.config.timeout)
+            except Exception as e:
+                return c.detailed_error(e)
+
         results = []
-        module_addresses = c.shuffle(list(self.namespace.values()))
-        batch_size = min(self.config.batch_size, len(module_addresses))
-        self.executor = c.module('executor.thread')(max_workers=batch_size)
-        batch_size = self.config.batch_size
-    
+        def collect(done):
+            for task in done:
+                result = task.result()
+                if self.config.debug or self.config.verbose:
+                    c.print(result)
+                if c.is_error(result):
+                    if self.config.verbose:
+                        c.print('ERROR', result)
+                    self.errors += 1
+                results.append(result)
+
+        # at most batch_size evals in flight, a finished one makes room for the next (sets keep the bookkeeping O(1))
+        pending = set()
         for module_address in module_addresses:
-            c.sleep(self.config.sample_sleep_interval)
+            await asyncio.sleep(self.config.sample_sleep_interval)
             is_address = c.is_address(module_address)
             if not is_address:
-                c.print(f'{module_address} is not a valid address', verbose=self.config.verbose)
+                if self.config.verbose:
+                    c.print(f'{module_address} is not a valid address')
                 continue
-
-            # if the futures are less than the batch, we can submit a new future
             lag = c.time() - self.address2last_update.get(module_address, 0)
             if lag < self.config.min_update_interval:
                 # c.print(f'Module {module_address} is too fresh, skipping', verbose=self.config.debug)
                 continue
-            futures.append(self.executor.submit(self.eval, args=[module_address],timeout=self.config.timeout))
+            if len(pending) >= batch_size:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+            pending.add(asyncio.ensure_future(eval_module(module_address)))
             self.address2last_update[module_address] = c.time()
-            if len(futures) >= batch_size:
-                try:
-                    for future in c.as_completed(futures, timeout=self.config.timeout):
-                        result = future.result()
-                        c.print(result, verbose=self.config.debug or self.config.verbose)
-                        futures.remove(future)
-                        if c.is_error(result):
-                            c.print('ERROR', result, verbose=self.config.verbose)
-                            self.errors += 1
-                        results += [result]  
-                        break
-                except Exception as e:
-                    c.print(c.detailed_error(e))
 
-        if len(futures) >= 0:
-            try:
-                for future in c.as_completed(futures, timeout=self.config.timeout):
-                    futures.remove(future) # remove the future
-                    result = future.result() # result 
-                    results += [result]  
-            except Exception as e:
-                c.print('ERROR',c.detailed_error(e))
+        if len(pending) > 0:
+            done, pending = await asyncio.wait(pending)
+            collect(done)
+        # the infos of the epoch go to disk together
+        self.store().flush()
         return results
         
 
     
+    def prefetch_loop(self):
+        c.sleep(self.config.initial_sleep)
+        while True:
+            c.sleep(self.config.prefetch_interval)
+            try:
+                self.prefetch()
+            except Exception as e:
+                c.print(c.detailed_error(e))
+
+    def prefetch(self, n:int = None) -> List[dict]:
+        """
+        Evals the n modules with the oldest stored info (never evaluated first) one at a time, 
+        so the epoch finds them fresh and skips them instead of starting cold.
+        """
+        n = n or self.config.prefetch_batch
+        # address -> (timestamp, next_retry) of everything stored, failure streaks included
+        address2info = {}
+        for _, _, r in self.store().items():
+            if isinstance(r, dict) and 'address' in r:
+                address2info[r['address']] = (r.get('timestamp', 0) or 0, r.get('next_retry', 0) or 0)
+        now = c.time()
+        def is_due(address:str) -> bool:
+            if now - self.address2last_update.get(address, 0) <= self.config.min_update_interval:
+                return False
+            if address in address2info:
+                # a failing module waits out its backoff
+                return address2info[address][1] <= now
+            # never stored (its eval keeps raising), try it at most once per backoff
+            return now - self.address2last_prefetch.get(address, 0) > self.config.backoff
+        addresses = [a for a in self.namespace.values() if is_due(a)]
+        results = []
+        for address in heapq.nsmallest(n, addresses, key=lambda a: address2info.get(a, (0, 0))[0]):
+            self.address2last_update[address] = self.address2last_prefetch[address] = c.time()
+            try:
+                results += [self.eval(address)]
+            except Exception as e:
+                results += [c.detailed_error(e)]
+        return results
+
     def epoch_info(self):
         return {
             'requests': self.requests,
@@ -222,7 +415,14 @@ class Vali(c.Module):
         config.subnet = subnet or config.subnet or config.netuid
         config.max_age_network = max_age or self.config.max_age_network
 
-        if self.network_staleness() < config.sync_interval:
+        if hasattr(self, 'subspace') and 'subspace' in config.network and self.network == config.network:
+            # the chain only changes with a new block, so rebuild once per block instead of once per interval
+            block = self.cached_rpc('get_block', network=config.network, ttl=1)
+            is_synced = block == self.last_sync_block
+        else:
+            block = None
+            is_synced = self.network_staleness() < config.sync_interval
+        if is_synced:
             return {'msg': 'Alredy Synced network Within Interval', 
                     'staleness': self.network_staleness(), 
                     'sync_interval': self.config.sync_interval,
@@ -231,8 +431,10 @@ class Vali(c.Module):
                     'n': self.n,
                     'fn': self.config.fn,
                     'search': self.config.search,
+                    'block': self.last_sync_block,
                     }
         self.last_sync_time = c.time()
+        self.last_sync_block = block
         if self.network_staleness() > config.max_age_network:
             return {'msg': 'Alredy Synced network Within Interval', 
                     'last_sync_time': self.last_sync_time,
@@ -245,11 +447,14 @@ class Vali(c.Module):
             if '.' in config.network:
                 config.network, config.netuid = config.network.split('.')
 
-            self.subspace = c.module('subspace')(network=config.network, netuid=config.netuid)
+            # one client per network for every worker, its websocket is reused instead of reopened per sync
+            if config.network not in self.subspaces:
+                self.subspaces[config.network] = c.module('subspace')(network=config.network, netuid=config.netuid)
+            self.subspace = self.subspaces[config.network]
             if isinstance(config.netuid, str):
                 config.netuid = self.subspace.subnet2netuid(config.netuid)
-            namespace = self.subspace.namespace(netuid=config.netuid, max_age=config.max_age_network)
-            config.subnet = self.subspace.netuid2subnet(config.netuid)
+            namespace = self.cached_rpc('namespace', netuid=config.netuid, max_age=config.max_age_network)
+            config.subnet = self.cached_rpc('netuid2subnet', config.netuid)
         if 'bittensor' in config.network:
             self.subtensor = c.module('bittensor')(network=config.network, netuid=config.netuid)
             namespace = self.subtensor.namespace(netuid=config.netuid, max_age=config.max_age_network)
@@ -257,14 +462,16 @@ class Vali(c.Module):
             # local network
             namespace = c.get_namespace(search=config.search, max_age=config.max_age_network)
     
-        self.namespace = namespace
-        self.namespace = {k: v for k, v in namespace.items() if self.filter_module(k)}
+        source_namespace, source_search = self.source_namespace
+        if namespace is not source_namespace or config.search != source_search:
+            # cached_rpc hands back the same namespace until a new block, only filter a new one
+            self.source_namespace = (namespace, config.search)
+            self.namespace = {k: v for k, v in namespace.items() if self.filter_module(k)}
 
         self.n  = len(self.namespace)    
         self.name2address = self.namespace
-        self.address2name = {v: k for k, v in self.namespace.items()}  
 
-        self.network = network
+        self.network = config.network
         self.netuid = netuid
         self.fn = fn
         self.search = search
@@ -277,21 +484,47 @@ class Vali(c.Module):
 
     
 
+    def cached_rpc(self, fn:str, *args, block:int = None, ttl:float = None, **kwargs):
+        """
+        self.subspace.<fn>(*args, **kwargs) through rpc_cache. Without a block the result is 
+        the head and is kept for ttl (a block time), with a block it never changes.
+        """
+        # head reads are keyed by the last synced block too, so a new block leaves the old entries behind
+        key = (fn, self.config.network, self.config.netuid, block or ('head', self.last_sync_block), args, tuple(sorted(kwargs.items())))
+        value = self.rpc_cache.get(key)
+        if value == None:
+            if block != None:
+                kwargs['block'] = block
+            value = getattr(self.subspace, fn)(*args, **kwargs)
+            ttl = None if block != None else (ttl or self.config.block_time)
+            self.rpc_cache.put(key, value, ttl=ttl)
+        return value
+
+    @property
+    def address2name(self) -> Dict[str, str]:
+        # inverted once per namespace instead of on every sync
+        namespace, address2name = self.namespace_address2name
+        if namespace is not self.namespace:
+            address2name = {v: k for k, v in self.namespace.items()}
+            self.namespace_address2name = (self.namespace, address2name)
+        return address2name
+
     @property
     def verbose(self):
         return self.config.verbose or self.config.debug
     
 
+    # bool is a subclass of int, so this takes numbers and booleans
+    number_types = (int, float)
+
     def process_response(self, response:dict):
-        if type(response) in [int, float, bool]:
+        if isinstance(response, self.number_types):
             # if the response is a number, we want to convert it to a dict
-            response = {'w': float(response)}
-        elif type(response) == dict:
-            response = response
-        else:
+            return {'w': float(response)}
+        if not isinstance(response, dict):
             raise Exception(f'Response must be a number or a boolean, got {response}')
-        
-        assert type(response['w']) in [int, float], f'Response weight must be a number, got {response["w"]}'
+        w = response['w']
+        assert isinstance(w, self.number_types) and not isinstance(w, bool), f'Response weight must be a number, got {w}'
         return response
     
 
@@ -330,7 +563,9 @@ class Vali(c.Module):
         verbose = verbose or self.verbose
         # load the module stats (if it exists)
         network = network or self.config.network
-        self.sync(network=network)
+        if network != getattr(self, 'network', None):
+            # the epoch keeps the network synced, the eval threads only sync on a network switch
+            self.sync(network=network)
         module = module or self.next_module()
 
 
@@ -350,24 +585,36 @@ class Vali(c.Module):
             info['name'] = self.address2name[module]
             info['address'] = module
             
-        # CONNECT TO THE MODULE
-        module = c.connect(info['address'], key=self.key)
-        path = self.resolve_path(self.storage_path() + f"/{info['name']}")
-        cached_info = self.get(path, {})
-
-        if len(cached_info) > 0 :
-            info = cached_info
-        else:
-            info = module.info(timeout=self.config.timeout)
-
-        c.print(f'🚀 :: Eval Module {info["name"]} :: 🚀',  color='yellow', verbose=verbose)
-
-        assert 'address' in info and 'name' in info, f'Info must have a address key, got {info}'
+        path = self.storage_path() + f"/{info['name']}"
+        cached_info = self.store().get(info['name'], {})
+        if c.time() < cached_info.get('next_retry', 0):
+            # the module keeps failing, dont spend a connection on it until its backoff is over
+            return {'w': cached_info.get('w', 0), 
+                    'name': info['name'], 
+                    'address': info['address'], 
+                    'consecutive_errors': cached_info.get('consecutive_errors', 0),
+                    'msg': 'backoff'}
+
+        # the name and address come from the namespace (a module can re-serve somewhere else), the rest from the stored info,
+        # a module that failed before it could be scored only has its failure streak stored
+        address = info['address']
+        info = {**cached_info, **info}
         info['staleness'] = c.time() - info.get('timestamp', 0)
         info['path'] = path
 
         start_time = c.time()
         try:
+            # CONNECT TO THE MODULE
+            module = c.connect(address, key=self.key)
+            if 'ss58_address' not in info or cached_info.get('address') != address:
+                info.update(module.info(timeout=self.config.timeout))
+                # keep the address it was reached at, so the next eval finds it unchanged
+                info['address'] = address
+            assert 'address' in info and 'name' in info, f'Info must have a address key, got {info}'
+
+            if verbose:
+                c.print(f'🚀 :: Eval Module {info["name"]} :: 🚀',  color='yellow')
+
             response = self.score_module(module)
             response = self.process_response(response)
         except Exception as e:
@@ -376,15 +623,28 @@ class Vali(c.Module):
             response = {'w': 0, 'error': error}
             verbose_keys += ['error']
 
-        c.print(response, color='red', verbose=verbose)
+        if verbose:
+            c.print(response, color='red')
+        if 'error' in response:
+            # double the wait per failure in a row, after max_errors the breaker opens and the module waits the max
+            errors = info.get('consecutive_errors', 0) + 1
+            backoff = self.config.max_backoff if errors >= self.config.max_errors else min(self.config.backoff * 2**(errors - 1), self.config.max_backoff)
+            response['consecutive_errors'] = errors
+            response['next_retry'] = start_time + backoff
+        else:
+            response['consecutive_errors'] = 0
+            response['next_retry'] = 0
+            info.pop('error', None)
         response['timestamp'] = start_time
         response['latency'] = c.time() - response.get('timestamp', 0)
         response['w'] = response['w']  * self.config.alpha + info.get('w', response['w']) * (1 - self.config.alpha)
         response['w'] = c.round(response['w'], 3)
         # merge the info with the response
         info.update(response)
-        self.put(path, info)
-        response =  {k:info[k] for k in verbose_keys}
+        # skip the write when w, the error streak and the timestamp (to write_interval) match the last one
+        write_key = (info['w'], info['consecutive_errors'], int(info['timestamp'] // self.config.write_interval))
+        self.store().put_if_changed(info['name'], info, write_key)
+        response =  {k:info.get(k, None) for k in verbose_keys}
 
         # record the success statistics
         if response['w'] > 0:
@@ -411,6 +671,15 @@ class Vali(c.Module):
         storage_path = self.resolve_path(path)
 
         return storage_path
+
+    # storage_path -> ModuleStore, one connection per store shared by every worker thread
+    stores = {}
+
+    def store(self, network=None) -> ModuleStore:
+        path = self.storage_path(network=network) + '/module_infos.db'
+        if path not in self.stores:
+            self.stores[path] = ModuleStore(path)
+        return self.stores[path]
         
     
     
@@ -438,21 +707,23 @@ class Vali(c.Module):
     def votes(self, 
                   
             ):
+        import numpy as np
         network = self.config.network
-        keys = ['name', 'w', 'staleness','latency', 'ss58_address']
-        leaderboard = self.leaderboard(network=network, 
-                                       keys=keys, 
-                                       to_dict=True, 
-                                       n=self.config.max_votes)
+        infos = self.module_infos(keys=['w', 'ss58_address'], max_age=self.config.max_leaderboard_age, network=network)
         votes = {'keys' : [],'weights' : [],'uids': [], 'timestamp' : c.time()  }
-        key2uid = self.subspace.key2uid() if hasattr(self, 'subspace') else {}
-        for info in leaderboard:
-            ## valid modules have a weight greater than 0 and a valid ss58_address
-            if 'ss58_address' in info and info['w'] >= 0:
-                if info['ss58_address'] in key2uid:
-                    votes['keys'] += [info['ss58_address']]
-                    votes['weights'] += [info['w']]
-                    votes['uids'] += [key2uid.get(info['ss58_address'], -1)]
+        key2uid = self.cached_rpc('key2uid', netuid=self.config.netuid) if hasattr(self, 'subspace') else {}
+        if len(infos) == 0:
+            return votes
+        # one array per field, the top max_votes by weight and the validity mask are whole array ops
+        addresses = np.array([info['ss58_address'] for info in infos])
+        weights = np.fromiter((-1 if info['w'] == None else info['w'] for info in infos), dtype=np.float64, count=len(infos))
+        top = np.argsort(-weights, kind='stable')[:self.config.max_votes]
+        addresses, weights = addresses[top], weights[top]
+        ## valid modules have a weight greater than 0 and a registered ss58_address
+        mask = (weights >= 0) & np.isin(addresses, list(key2uid.keys()))
+        votes['keys'] = addresses[mask].tolist()
+        votes['weights'] = weights[mask].tolist()
+        votes['uids'] = [key2uid[k] for k in votes['keys']]
         assert len(votes['uids']) == len(votes['weights']), f'Length of uids and weights must be the same, got {len(votes["uids"])} uids and {len(votes["weights"])} weights'
 
         return votes
@@ -472,16 +743,20 @@ class Vali(c.Module):
         if len(uids) < self.config.min_num_weights:
             return {'success': False, 
                     'msg': 'The votes are too low', 
-                    'votes': len(votes['uids']), 
+                    'votes': len(uids), 
                     'min_num_weights': self.config.min_num_weights}
         
-        return self.subspace.set_weights(uids=uids, # passing names as uids, to avoid slot conflicts
+        response = self.subspace.set_weights(uids=uids, # passing names as uids, to avoid slot conflicts
                             weights=weights, 
                             key=self.key, 
                             network=self.config.network, 
                             netuid=self.config.netuid,
                             **kwargs
                             )
+        # the vote moved last_update, dont serve the cached module info from before it
+        self.rpc_cache.clear()
+        self.last_vote_update = None
+        return response
     
     vote = set_weights
     
@@ -489,7 +764,7 @@ class Vali(c.Module):
 
 
     def module_info(self, **kwargs):
-        return self.subspace.module_info(self.key.ss58_address, netuid=self.config.netuid, **kwargs)
+        return self.cached_rpc('module_info', self.key.ss58_address, netuid=self.config.netuid, **kwargs)
     
     def leaderboard(self,
                     keys = ['name', 'w', 
@@ -508,46 +783,71 @@ class Vali(c.Module):
                     ):
         if hasattr(self.config, 'max_leaderboard_age'):
             max_age = self.config.max_leaderboard_age
-        paths = self.module_paths(network=network)
-        df = []
-        # chunk the jobs into batches
-        for path in paths:
-            r = self.get(path, max_age=max_age)
-            if isinstance(r, dict) and 'ss58_address' in r:
-                r['staleness'] = c.time() - r.get('timestamp', 0)
-                df += [{k: r.get(k, None) for k in keys}]
-            else :
-                # removing the path as it is not a valid module and is too old
-                self.rm(path)
-        self.put(path, df) 
-        df = c.df(df) 
-        assert len(df) > 0
-        df = df.sort_values(by=sort_by, ascending=ascending)
+        rows = self.module_infos(keys=keys, max_age=max_age, network=network)
+        self.put(path, rows) 
+        assert len(rows) > 0
         if min_weight > 0:
-            df = df[df['w'] > min_weight]
-        if n != None:
-            if page != None:
-                df = df[page*n:(page+1)*n]
-            else:
-                df = df[:n]
+            rows = [r for r in rows if r['w'] != None and r['w'] > min_weight]
+        # rows missing a sort value go last, like pandas does with nan
+        sort_key = operator.itemgetter(*sort_by)
+        unsortable = [r for r in rows if any(r.get(k) == None for k in sort_by)]
+        rows = [r for r in rows if all(r.get(k) != None for k in sort_by)]
+        if n != None and page == None:
+            # only the top n are shown, a heap is O(N log n) instead of sorting everything
+            select = heapq.nsmallest if ascending else heapq.nlargest
+            rows = select(n, rows, key=sort_key) + unsortable[:max(n - len(rows), 0)]
+        else:
+            rows = sorted(rows, key=sort_key, reverse=not ascending) + unsortable
+            if n != None:
+                rows = rows[page*n:(page+1)*n]
 
-        # if to_dict is true, we return the dataframe as a list of dictionaries
+        # if to_dict is true, we return the rows as a list of dictionaries
         if to_dict:
-            return df.to_dict(orient='records')
+            return rows
 
-        return df
+        return c.df(rows)
 
 
     
     l = leaderboard
     
+    def module_infos(self, 
+                     keys:List[str] = None, 
+                     max_age:int = 3600, 
+                     network:str = None) -> List[dict]:
+        """
+        The stored module infos cut down to keys, from one read of the store. 
+        Infos that are too old or not a module info are removed.
+        """
+        store = self.store(network=network)
+        # ss58_address -> info, a key stored under several names (renamed modules) keeps its freshest info
+        address2info = {}
+        expired = []
+        now = c.time()
+        for name, timestamp, r in store.items():
+            if now - timestamp > max_age or not isinstance(r, dict) or ('ss58_address' not in r and 'next_retry' not in r):
+                # removing the info as it is not a valid module and is too old
+                expired += [name]
+            elif 'ss58_address' in r:
+                address = r['ss58_address']
+                if address not in address2info or r.get('timestamp', 0) > address2info[address].get('timestamp', 0):
+                    address2info[address] = r
+            # else a module that failed before it was scored, keep its failure streak but leave it out
+        if len(expired) > 0:
+            store.rm(expired)
+        module_infos = []
+        for r in address2info.values():
+            r['staleness'] = now - r.get('timestamp', 0)
+            module_infos += [r if keys == None else {k: r.get(k, None) for k in keys}]
+        return module_infos
+
     def module_paths(self, network=None):
-        paths = self.ls(self.storage_path(network=network))
+        storage_path = self.storage_path(network=network)
+        paths = [f'{storage_path}/{name}' for name in self.store(network=network).names()]
         return paths
     
     def save_module_info(self, k:str, v:dict,):
-        path = self.storage_path() + f'/{k}'
-        self.put(path, v)
+        self.store().put(k, v)
     
 
     def __del__(self):
@@ -579,11 +879,16 @@ class Vali(c.Module):
 
 
 
+    # last_update of the validator's module, only its own vote moves it so it is read once per vote
+    last_vote_update = None
+
     @property
     def vote_staleness(self):
         try:
             if 'subspace' in self.config.network:
-                return self.subspace.block - self.module_info()['last_update']
+                if self.last_vote_update == None:
+                    self.last_vote_update = self.module_info()['last_update']
+                return self.cached_rpc('get_block', network=self.config.network) - self.last_vote_update
         except Exception as e:
             pass
         return 0